@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import networkx as nx
+import pandas as pd
+
+from create_graph import create_graph, filter_records, nx_to_graphology, simplify_graph_for_gexf
+from graphology_io import write_graphology
+from person_parser import DEFAULT_CACHE_SIZE, parse_person_series, set_cache_size
+from synthetic_erb import generate_erb
+from update_data import load_languages, update_graphology_file
+
+# File the results of all runs are appended to, one JSON object per line
+RESULTS_PATH = "../data/benchmarks/results.jsonl"
+
+
+def measure(func, memory=True):
+    """
+    Time func() and, if memory is True, run it again under tracemalloc to measure its peak allocation.
+    The second run keeps the tracing overhead out of the timing.
+
+    Returns:
+    - result: The return value of the timed call.
+    - seconds: Wall time of the timed call.
+    - peak_mb: Peak traced allocation in MiB, or None.
+    """
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def parse_stage(df):
+    """
+    Parse the person columns of the filtered records with an empty parser cache.
+    """
+    set_cache_size(DEFAULT_CACHE_SIZE)
+    df = filter_records(df, 1800, 2025)
+    return [parse_person_series(df[column]) for column in ["creator", "contributor"]]
+
+
+def graph_stage(df):
+    """
+    Build the graph with an empty parser cache, like a fresh run of create_graph.py.
+    """
+    set_cache_size(DEFAULT_CACHE_SIZE)
+    return create_graph(df, 1800, 2025, id_to_int=True)
+
+
+def update_stage(graph_path, output_path, layout_positions):
+    """
+    Apply the update_data.py transforms to the written graph with a placeholder layout.
+    Reading and writing the files is part of the stage, as in update_data.py.
+    """
+    language_codes, language_colors = load_languages()
+    return update_graphology_file(graph_path, output_path, layout_positions, language_codes, language_colors)
+
+
+def run_benchmarks(rows, memory=True, seed=42):
+    """
+    Run the pipeline stages on a synthetic bibliography of the given size.
+
+    Parameters:
+    - rows: Number of synthetic records, see synthetic_erb.generate_erb().
+    - memory: Also measure the peak allocation of every stage.
+    - seed: Seed of the synthetic data.
+
+    Returns:
+    - results: A list of dicts with 'rows', 'stage', 'seconds' and 'peak_mb'.
+    """
+    erb = generate_erb(rows, seed=seed)
+    df = erb.query('is_fiction == True and language == "est" and language_original.notna()')
+    results = []
+
+    def run(stage, func):
+        result, seconds, peak_mb = measure(func, memory)
+        results.append({"rows": rows, "stage": stage, "seconds": seconds, "peak_mb": peak_mb})
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_path = os.path.join(tmp, "data.json")
+        run("parse", lambda: parse_stage(df))
+        G = run("create_graph", lambda: graph_stage(df))
+        run("nx_to_graphology", lambda: nx_to_graphology(G))
+        run("write_graphology", lambda: write_graphology(G, graph_path))
+        G_gephi = run("simplify_graph_for_gexf", lambda: simplify_graph_for_gexf(G))
+        run("write_gexf", lambda: nx.write_gexf(G_gephi, os.path.join(tmp, "data_for_gephi.gexf")))
+        layout_positions = {str(node): (float(i), float(-i), 1.0) for i, node in enumerate(G.nodes)}
+        run("update_data", lambda: update_stage(graph_path, os.path.join(tmp, "data_updated.json"), layout_positions))
+    return results
+
+
+def git_commit():
+    """
+    Return the short hash of the checked out commit, or None outside a git repository.
+    """
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path=RESULTS_PATH):
+    """
+    Load all saved benchmark results into a DataFrame (empty if there are none).
+    """
+    if not os.path.isfile(path):
+        return pd.DataFrame(columns=["run", "commit", "python", "rows", "stage", "seconds", "peak_mb"])
+    return pd.read_json(path, lines=True, dtype={"run": str, "commit": str})
+
+
+def save_results(results, path=RESULTS_PATH):
+    """
+    Append the results of a run to the results file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def compare_results(results, previous):
+    """
+    Put the results next to the latest previous run with the same rows and stage.
+
+    Returns:
+    - comparison: pd.DataFrame with the columns 'rows', 'stage', 'seconds', 'peak_mb',
+      'previous_seconds' and 'change' (relative change of the time).
+    """
+    current = pd.DataFrame(results)[["rows", "stage", "seconds", "peak_mb"]]
+    if previous.empty:
+        return current.assign(previous_seconds=None, change=None)
+    latest = previous.sort_values("run").drop_duplicates(["rows", "stage"], keep="last")
+    latest = latest[["rows", "stage", "seconds"]].rename(columns={"seconds": "previous_seconds"})
+    comparison = current.merge(latest, on=["rows", "stage"], how="left")
+    return comparison.assign(change=comparison["seconds"] / comparison["previous_seconds"] - 1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the graph pipeline on synthetic ERB data.")
+    parser.add_argument("rows", nargs="*", type=int, default=[10_000, 100_000], help="numbers of synthetic records (default: 10000 100000)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs that measure peak memory")
+    parser.add_argument("--no-save", action="store_true", help=f"don't append the results to {RESULTS_PATH}")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the synthetic data (default: 42)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_id = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    commit = git_commit()
+
+    results = []
+    for rows in args.rows:
+        print(f"Benchmarking {rows} records")
+        results.extend(run_benchmarks(rows, memory=not args.no_memory, seed=args.seed))
+    results = [{"run": run_id, "commit": commit, "python": platform.python_version(), **result} for result in results]
+
+    comparison = compare_results(results, load_results())
+    print(comparison.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    if not args.no_save:
+        save_results(results)
+        print(f"Results appended to {RESULTS_PATH}")
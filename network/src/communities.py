@@ -0,0 +1,242 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+import compact_graph
+import summaries
+
+# Seed of the Louvain runs, so that repeated runs find the same communities
+SEED = 42
+
+
+def node_identity(G, node):
+    """
+    Identify a node across year windows by its label, as integer node keys differ between windows.
+    """
+    return G.nodes[node].get("label", node)
+
+
+def warm_start_graph(G, previous):
+    """
+    Contract the nodes that shared a community in the previous window into one node, so that Louvain
+    starts from the previous partition. Nodes that are new in this window stay single nodes.
+
+    Returns:
+    - H: The contracted graph, with the summed edge weights (edges within a group become self-loops).
+    - groups: A dict mapping the nodes of G to the nodes of H.
+    """
+    groups = {}
+    for node in G.nodes():
+        community = previous.get(node_identity(G, node))
+        groups[node] = ("previous", community) if community is not None else ("node", node)
+
+    H = nx.DiGraph() if G.is_directed() else nx.Graph()
+    H.add_nodes_from(dict.fromkeys(groups.values()))
+    for u, v, weight in G.edges(data="weight", default=1):
+        gu, gv = groups[u], groups[v]
+        if H.has_edge(gu, gv):
+            H[gu][gv]["weight"] += weight
+        else:
+            H.add_edge(gu, gv, weight=weight)
+    return H, groups
+
+
+def detect_communities(G, seed=SEED, resolution=1.0, previous=None):
+    """
+    Find the communities of a graph with the Louvain method, weighted by the edge weights.
+    Runs in the worker processes of detect_window_communities(), so it has to stay a module-level function.
+
+    Parameters:
+    - G: A NetworkX graph or a compact_graph.CompactGraph.
+    - seed: Seed of the Louvain method.
+    - resolution: Louvain resolution, larger values give smaller communities.
+    - previous: A dict mapping node identities (labels) to the communities of the previous window, to start from (optional).
+      Nodes that shared a community there start in one community, but Louvain never splits them again.
+
+    Returns:
+    - partition: A dict mapping nodes to community numbers, the largest community first.
+    """
+    G = compact_graph.as_networkx(G)
+    if previous:
+        H, groups = warm_start_graph(G, previous)
+        group_communities = nx.community.louvain_communities(H, weight="weight", resolution=resolution, seed=seed)
+        members = {group: [] for group in H}
+        for node, group in groups.items():
+            members[group].append(node)
+        communities = [[node for group in community for node in members[group]] for community in group_communities]
+    else:
+        communities = nx.community.louvain_communities(G, weight="weight", resolution=resolution, seed=seed)
+
+    # Number by size, ties by the first node in graph order
+    order = {node: i for i, node in enumerate(G.nodes())}
+    communities = sorted(communities, key=lambda community: (-len(community), min(order[node] for node in community)))
+    return {node: i for i, community in enumerate(communities) for node in community}
+
+
+def match_communities(G, partition, previous):
+    """
+    Renumber the communities of a window after those of the previous window: each community takes the
+    number of the previous community it shares the most nodes with, largest overlaps first.
+    Communities without a match get numbers above all previous ones.
+
+    Parameters:
+    - G: The graph of the window.
+    - partition: A dict mapping nodes to community numbers, see detect_communities().
+    - previous: A dict mapping node identities to the community numbers of the previous window.
+
+    Returns:
+    - partition: The renumbered partition.
+    """
+    overlaps = pd.DataFrame({
+        "community": list(partition.values()),
+        "previous": [previous.get(node_identity(G, node)) for node in partition],
+    }).dropna()
+    overlaps = overlaps.groupby(["community", "previous"]).size().reset_index(name="overlap")
+    overlaps = overlaps.sort_values(["overlap", "community", "previous"], ascending=[False, True, True], kind="stable")
+
+    mapping, taken = {}, set()
+    for community, previous_community in zip(overlaps["community"].tolist(), overlaps["previous"].tolist()):
+        if community not in mapping and previous_community not in taken:
+            mapping[community] = int(previous_community)
+            taken.add(previous_community)
+    next_id = max(previous.values(), default=-1) + 1
+    for community in sorted(set(partition.values()) - set(mapping)):
+        mapping[community] = next_id
+        next_id += 1
+    return {node: mapping[community] for node, community in partition.items()}
+
+
+def map_graphs(func, graphs, workers, *args):
+    """
+    Apply func(G, *args) to every graph, in a pool of worker processes if workers > 1.
+    """
+    if workers <= 1 or len(graphs) <= 1:
+        return [func(G, *args) for G in graphs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, compact_graph.as_networkx(G), *args) for G in graphs]
+        return [future.result() for future in futures]
+
+
+def detect_window_communities(graphs, seed=SEED, resolution=1.0, warm_start=False, workers=1):
+    """
+    Find the communities of the graphs of consecutive year windows, e.g. from create_graphs().
+
+    The windows are independent, so they run in a pool of worker processes if workers > 1. With warm_start,
+    every window is run a second time starting from the partition that the first pass found for the previous
+    window (see detect_communities()), which keeps the communities of consecutive windows similar; the
+    second pass runs in parallel too. The communities are then renumbered after those of the previous
+    window, so that a number refers to the same community over time.
+
+    Parameters:
+    - graphs: A list of NetworkX graphs or compact_graph.CompactGraphs, in window order.
+    - seed: Seed of the Louvain method, the same for all windows.
+    - resolution: Louvain resolution.
+    - warm_start: Start each window from the partition of the previous one.
+    - workers: Number of worker processes.
+
+    Returns:
+    - partitions: A list of dicts mapping nodes to community numbers, in the order of graphs.
+    """
+    partitions = map_graphs(detect_communities, graphs, workers, seed, resolution)
+    if warm_start and len(graphs) > 1:
+        starts = [None] + [
+            {node_identity(compact_graph.as_networkx(G), node): community for node, community in partition.items()}
+            for G, partition in zip(graphs[:-1], partitions[:-1])
+        ]
+        if workers <= 1:
+            warm = [detect_communities(G, seed, resolution, start) for G, start in zip(graphs[1:], starts[1:])]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(detect_communities, compact_graph.as_networkx(G), seed, resolution, start) for G, start in zip(graphs[1:], starts[1:])]
+                warm = [future.result() for future in futures]
+        partitions = partitions[:1] + warm
+
+    # Renumber every window after the previous one
+    for i in range(1, len(partitions)):
+        previous_graph, G = compact_graph.as_networkx(graphs[i - 1]), compact_graph.as_networkx(graphs[i])
+        previous = {node_identity(previous_graph, node): community for node, community in partitions[i - 1].items()}
+        partitions[i] = match_communities(G, partitions[i], previous)
+    return partitions
+
+
+def language_metrics(G, partition):
+    """
+    Compute the language distribution and language centralization of every community from the original
+    languages of the works on the edges within the community.
+
+    Parameters:
+    - G: A NetworkX graph or a compact_graph.CompactGraph.
+    - partition: A dict mapping nodes to community numbers.
+
+    Returns:
+    - metrics: pd.DataFrame indexed by community with the columns 'nodes', 'edges' (edges within the community),
+      'total_edges' (works on these edges), 'n_languages', 'dominant_language' (ties by first occurrence),
+      'dominant_proportion', 'entropy' (Shannon entropy of the language shares, in nats) and 'language_counts'
+      (a dict of the counts, most frequent first). Communities without edges have missing language metrics.
+    """
+    communities = pd.Series(partition, dtype=np.int64)
+    edges = [(partition[u], partition[v], languages or []) for u, v, languages in G.edges(data="languages")]
+    internal = [(community, languages) for community, target, languages in edges if community == target]
+
+    counts = np.array([len(languages) for _, languages in internal], dtype=np.int64)
+    # Languages in order of first occurrence, missing languages as None
+    language_codes, languages = summaries.factorize([language for _, languages in internal for language in languages])
+    works = pd.DataFrame({
+        "community": np.repeat(np.array([community for community, _ in internal], dtype=np.int64), counts),
+        "order": language_codes,
+    })
+
+    language_counts = works.groupby(["community", "order"]).size().reset_index(name="count")
+    language_counts = language_counts.sort_values(["community", "count", "order"], ascending=[True, False, True])
+    totals = language_counts.groupby("community")["count"].transform("sum")
+    shares = language_counts["count"] / totals
+    language_counts = language_counts.assign(entropy=-shares * np.log(shares))
+
+    by_community = language_counts.groupby("community", sort=True)
+    dominant = language_counts.drop_duplicates("community").set_index("community")
+    # Object series, so that pandas keeps missing languages as None
+    dominant_language = pd.Series(languages[dominant["order"].to_numpy()], index=dominant.index, dtype=object)
+    counts_by_language = pd.Series(
+        [dict(zip(languages[group["order"].to_numpy()].tolist(), group["count"].tolist())) for _, group in by_community],
+        index=dominant.index, dtype=object,
+    )
+    metrics = pd.DataFrame({
+        "nodes": communities.value_counts().sort_index(),
+        "edges": pd.Series([community for community, _ in internal], dtype=np.int64).value_counts(),
+        "total_edges": by_community["count"].sum(),
+        "n_languages": by_community.size(),
+        "dominant_language": dominant_language,
+        "dominant_proportion": dominant["count"] / by_community["count"].sum(),
+        "entropy": by_community["entropy"].sum(),
+        "language_counts": counts_by_language,
+    })
+    metrics.index.name = "community"
+    for column in ["edges", "total_edges", "n_languages"]:
+        metrics[column] = metrics[column].fillna(0).astype(np.int64)
+    return metrics
+
+
+def add_communities(graphs, seed=SEED, resolution=1.0, warm_start=False, workers=1):
+    """
+    Detect the communities of the graphs of year windows (see detect_window_communities()) and store them:
+    every node gets the attribute 'community', and every graph the attribute 'communities', a list of
+    the language_metrics() of its communities as dicts with a 'community' key, largest community first.
+
+    Returns:
+    - graphs: The graphs, updated in place.
+    """
+    partitions = detect_window_communities(graphs, seed, resolution, warm_start, workers)
+    for G, partition in zip(graphs, partitions):
+        compact_graph.set_node_attributes(G, partition, "community")
+        metrics = language_metrics(G, partition).sort_values("nodes", ascending=False, kind="stable").reset_index()
+        metrics["language_counts"] = [
+            [[language, count] for language, count in counts.items()] if isinstance(counts, dict) else []
+            for counts in metrics["language_counts"]
+        ]
+        G.graph["communities"] = [
+            {key: (None if isinstance(value, float) and np.isnan(value) else value) for key, value in record.items()}
+            for record in metrics.astype(object).to_dict("records")
+        ]
+    return graphs
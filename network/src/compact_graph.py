@@ -0,0 +1,322 @@
+import numpy as np
+import pandas as pd
+import networkx as nx
+import graph_base
+import instrumentation
+
+# Attributes of the finished graph in the order finalize_graph() leaves them
+EDGE_ATTRIBUTES = ["weight", "works", "languages", "genres", "activity_start", "activity_end", "language"]
+
+# Columns of the node table that node_attributes() turns into the attributes of the NetworkX graph
+NODE_COLUMNS = [
+    "label", "date_of_birth", "date_of_death", "first_role", "autor_count", "tõlkija_count",
+    "activity_start", "activity_end", "total_count", "main_role", "author_lang",
+]
+
+
+def expand_ranges(starts, counts):
+    """
+    Concatenate the ranges [start, start + count) into one index array.
+    """
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def offsets_from_counts(counts):
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+class CompactGraph:
+    """
+    Array-backed translator→author graph with the nodes, edges and attributes of the graph from create_graph().
+
+    Nodes are integers 0..n-1 in the node order of the NetworkX graph. Edges are stored as CSR adjacency
+    (indptr, indices) in the edge order of the NetworkX graph, with one array per edge attribute.
+    The works of an edge are offsets into a shared work table (one entry per record, with its title, year and
+    original language), the genres of an edge are offsets into a genre table.
+
+    Iterating with nodes(data=True) and edges(data=True) yields the same values as the NetworkX graph, so the
+    Graphology and GEXF exports accept either. Use to_networkx() for NetworkX algorithms; the converted
+    graph is built on first use and kept. Graph attributes are kept in the dict G.graph, like in NetworkX.
+    """
+
+    def __init__(self, nodes, indptr, indices, edges, work_offsets, work_ids, works, genre_offsets, genre_ids, genres, id_to_int=False):
+        """
+        Parameters:
+        - nodes: pd.DataFrame with one row per node and the NODE_COLUMNS. Further columns are added as node attributes.
+        - indptr, indices: CSR adjacency. The out-edges of node i are edges indptr[i]:indptr[i + 1], with the targets indices[...].
+        - edges: pd.DataFrame with one row per edge and the columns 'weight', 'activity_start', 'activity_end' and 'language'.
+        - work_offsets, work_ids: The works of edge e are the work table rows work_ids[work_offsets[e]:work_offsets[e + 1]].
+        - works: The work table, a pd.DataFrame with the columns 'title', 'year' and 'language'.
+        - genre_offsets, genre_ids: The genres of edge e are genres[genre_ids[genre_offsets[e]:genre_offsets[e + 1]]].
+        - genres: The genre table, an object array.
+        - id_to_int: Use the integer node ids as keys, otherwise the labels (like create_graph(id_to_int=...)).
+        """
+        self.node_table = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_table = edges
+        self.work_offsets = work_offsets
+        self.work_ids = work_ids
+        self.works = works
+        self.genre_offsets = genre_offsets
+        self.genre_ids = genre_ids
+        self.genres = genres
+        self.id_to_int = id_to_int
+        self.graph = {}
+        self.networkx_graph = None
+
+    def __len__(self):
+        return len(self.node_table)
+
+    def number_of_nodes(self):
+        return len(self.node_table)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def is_directed(self):
+        return True
+
+    @property
+    def sources(self):
+        """
+        Source node of every edge.
+        """
+        return np.repeat(np.arange(len(self.node_table)), np.diff(self.indptr))
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        return np.bincount(self.indices, minlength=len(self.node_table))
+
+    def node_keys(self):
+        return list(range(len(self.node_table))) if self.id_to_int else self.node_table["label"].tolist()
+
+    def nodes(self, data=False):
+        """
+        Iterate over the nodes like NetworkX's G.nodes(data=...): keys, (key, attrs) pairs,
+        or (key, value) pairs of one attribute if data is an attribute name.
+        """
+        keys = self.node_keys()
+        if data is False:
+            return iter(keys)
+        if data is not True:
+            values = self.node_table[data].tolist() if data in self.node_table else [None] * len(keys)
+            return zip(keys, values)
+        return zip(keys, self.node_attributes())
+
+    def node_attributes(self):
+        """
+        Yield the attribute dict of every node, with the keys in the order of the NetworkX graph.
+        """
+        columns = {column: self.node_table[column].tolist() for column in self.node_table.columns}
+        extra_columns = [column for column in self.node_table.columns if column not in NODE_COLUMNS]
+        for i in range(len(self.node_table)):
+            first_role = columns["first_role"][i]
+            other_role = "tõlkija" if first_role == "autor" else "autor"
+            attrs = {
+                "label": columns["label"][i],
+                "date_of_birth": columns["date_of_birth"][i],
+                "date_of_death": columns["date_of_death"][i],
+                f"{first_role}_count": columns[f"{first_role}_count"][i],
+                "activity_start": columns["activity_start"][i],
+                "activity_end": columns["activity_end"][i],
+            }
+            if columns[f"{other_role}_count"][i]:
+                attrs[f"{other_role}_count"] = columns[f"{other_role}_count"][i]
+            attrs["total_count"] = columns["total_count"][i]
+            attrs["main_role"] = columns["main_role"][i]
+            attrs["author_lang"] = columns["author_lang"][i]
+            for column in extra_columns:
+                attrs[column] = columns[column][i]
+            yield attrs
+
+    def edges(self, data=False):
+        """
+        Iterate over the edges like NetworkX's G.edges(data=...): (u, v) pairs, (u, v, attrs) triples,
+        or (u, v, value) triples of one attribute if data is an attribute name.
+        """
+        keys = self.node_keys()
+        sources = [keys[i] for i in self.sources.tolist()]
+        targets = [keys[i] for i in self.indices.tolist()]
+        if data is False:
+            return zip(sources, targets)
+        if data is not True:
+            values = self.edge_column(data) if data in EDGE_ATTRIBUTES else [None] * len(sources)
+            return zip(sources, targets, values)
+        columns = [self.edge_column(attribute) for attribute in EDGE_ATTRIBUTES]
+        return ((u, v, dict(zip(EDGE_ATTRIBUTES, values))) for u, v, *values in zip(sources, targets, *columns))
+
+    def edge_column(self, attribute):
+        """
+        Return the values of an edge attribute as a list, in edge order. 'works', 'languages' and 'genres'
+        are expanded from the work and genre tables.
+        """
+        if attribute in ("works", "languages"):
+            if attribute == "works":
+                values = list(zip(self.works["title"].tolist(), self.works["year"].tolist()))
+            else:
+                values = self.works["language"].tolist()
+            work_ids = self.work_ids.tolist()
+            offsets = self.work_offsets.tolist()
+            return [[values[w] for w in work_ids[offsets[e]:offsets[e + 1]]] for e in range(len(offsets) - 1)]
+        if attribute == "genres":
+            genres = self.genres[self.genre_ids].tolist()
+            offsets = self.genre_offsets.tolist()
+            return [genres[offsets[e]:offsets[e + 1]] for e in range(len(offsets) - 1)]
+        return self.edge_table[attribute].tolist()
+
+    def to_networkx(self):
+        """
+        Return the equivalent NetworkX DiGraph. It is built on the first call and kept.
+        """
+        if self.networkx_graph is None:
+            G = nx.DiGraph(**self.graph)
+            G.add_nodes_from(self.nodes(data=True))
+            G.add_edges_from(self.edges(data=True))
+            self.networkx_graph = G
+        return self.networkx_graph
+
+
+def set_node_attributes(G, values, name):
+    """
+    Set a node attribute of a NetworkX graph or a CompactGraph, like nx.set_node_attributes().
+
+    Parameters:
+    - G: A NetworkX graph or a CompactGraph.
+    - values: A dict mapping node keys to values. Nodes without a value get None in a CompactGraph.
+    - name: Name of the attribute.
+    """
+    if isinstance(G, CompactGraph):
+        G.node_table[name] = pd.Series([values.get(key) for key in G.node_keys()], dtype=object).to_numpy()
+        G.networkx_graph = None
+    else:
+        nx.set_node_attributes(G, values, name)
+
+
+def as_networkx(G):
+    """
+    Return G as a NetworkX graph, converting a CompactGraph.
+    """
+    return G.to_networkx() if isinstance(G, CompactGraph) else G
+
+
+def compact_graph(tables, min_year=None, max_year=None, id_to_int=False):
+    """
+    Build a CompactGraph from parsed tables, with the same nodes, edges and attributes as
+    create_graphs() builds from them. Genres are listed in order of first occurrence.
+
+    Parameters:
+    - tables: The (df, persons, pairs) tuple from create_graph.collect_tables().
+    - min_year: Minimum publication year (optional).
+    - max_year: Maximum publication year (optional).
+    - id_to_int: Use integer node keys.
+
+    Returns:
+    - G: A CompactGraph.
+    """
+    df, persons, pairs = tables
+    person_years = df["publication_date_cleaned"].to_numpy()[persons["record"].to_numpy()]
+    pair_years = pairs["year"].to_numpy()
+    min_year = person_years.min(initial=0) if min_year is None else min_year
+    max_year = person_years.max(initial=0) if max_year is None else max_year
+    persons = persons[(person_years >= min_year) & (person_years <= max_year)]
+    pairs = pairs[(pair_years >= min_year) & (pair_years <= max_year)]
+
+    works = pd.DataFrame({
+        "title": df["title"].to_numpy(dtype=object),
+        "year": df["publication_date_cleaned"].to_numpy(),
+        "language": df["language_original"].to_numpy(dtype=object),
+    })
+    if pairs.empty:
+        return empty_compact_graph(works, id_to_int)
+
+    columns = graph_base.graph_columns(df, persons, pairs)
+    n_nodes = len(columns["node_order"])
+    source, target = columns["source"], columns["target"]
+    bounds = columns["bounds"]
+
+    # Drop self-loops, then the nodes left without edges
+    kept_edges = np.flatnonzero(source != target)
+    kept_nodes = np.zeros(n_nodes, dtype=bool)
+    kept_nodes[source[kept_edges]] = True
+    kept_nodes[target[kept_edges]] = True
+    new_index = np.cumsum(kept_nodes) - 1
+    instrumentation.count("self_loops_removed", len(source) - len(kept_edges))
+    instrumentation.count("isolated_nodes_removed", n_nodes - kept_nodes.sum())
+
+    # Edges in NetworkX order: by source node, then in creation order
+    edge_order = kept_edges[np.argsort(new_index[source[kept_edges]], kind="stable")]
+    sources, targets = new_index[source[edge_order]], new_index[target[edge_order]]
+    indptr = offsets_from_counts(np.bincount(sources, minlength=int(kept_nodes.sum())))
+
+    # Works of every edge, as record numbers (rows of the work table)
+    counts = np.diff(bounds)[edge_order]
+    pair_positions = columns["pair_order"][expand_ranges(bounds[:-1][edge_order], counts)]
+    work_ids = pairs["record"].to_numpy()[pair_positions].astype(np.int64)
+    work_offsets = offsets_from_counts(counts)
+    edge_of_work = np.repeat(np.arange(len(edge_order)), counts)
+
+    # Most common original language per edge, ties resolved by first occurrence like Counter.most_common()
+    language_codes, language_values = pd.factorize(works["language"].to_numpy()[work_ids], use_na_sentinel=False)
+    language_counts = pd.DataFrame({"edge": edge_of_work, "language": language_codes, "position": np.arange(len(work_ids))})
+    language_counts = language_counts.groupby(["edge", "language"], sort=False).agg(count=("position", "size"), first=("position", "min"))
+    language_counts = language_counts.reset_index().sort_values(["edge", "count", "first"], ascending=[True, False, True])
+    edge_language = np.asarray(language_values, dtype=object)[language_counts.drop_duplicates("edge")["language"].to_numpy()]
+
+    # Distinct genres per edge, in order of first occurrence
+    genre_codes, genre_strings = pd.factorize(df["genre_keyword"], use_na_sentinel=False)
+    genre_lists = [list(dict.fromkeys(graph_base.process_genres(genre_str))) for genre_str in genre_strings]
+    genre_positions = {}
+    genre_table = np.array([genre_positions.setdefault(genre, len(genre_positions)) for genres in genre_lists for genre in genres], dtype=np.int64)
+    genre_index = np.array(list(genre_positions), dtype=object)
+    genre_sizes = np.array([len(genres) for genres in genre_lists], dtype=np.int64)
+    genre_starts = offsets_from_counts(genre_sizes)[:-1]
+    work_genre_sizes = genre_sizes[genre_codes[work_ids]]
+    work_genres = genre_table[expand_ranges(genre_starts[genre_codes[work_ids]], work_genre_sizes)]
+    edge_genres = pd.DataFrame({"edge": np.repeat(edge_of_work, work_genre_sizes), "genre": work_genres}).drop_duplicates()
+    genre_ids = edge_genres["genre"].to_numpy()
+    genre_offsets = offsets_from_counts(np.bincount(edge_genres["edge"].to_numpy(), minlength=len(edge_order)))
+
+    # Node attributes, including those finalize_graph() derives
+    labels = columns["node_order"][kept_nodes]
+    autor_count = np.asarray(columns["autor_count"])[kept_nodes]
+    tõlkija_count = np.asarray(columns["tõlkija_count"])[kept_nodes]
+    main_role = np.where(autor_count >= tõlkija_count, "autor", "tõlkija").astype(object)
+    language_index = graph_base.build_language_index(df, persons)
+    author_lang = [
+        graph_base.author_language(language_index, label) if role == "autor" else "tõlkija"
+        for label, role in zip(labels.tolist(), main_role.tolist())
+    ]
+    nodes = pd.DataFrame({
+        "label": labels,
+        "date_of_birth": pd.Series([date or 0 for date in columns["date_of_birth"]], dtype=object)[kept_nodes].to_numpy(),
+        "date_of_death": pd.Series([date or 0 for date in columns["date_of_death"]], dtype=object)[kept_nodes].to_numpy(),
+        "first_role": np.asarray(columns["first_role"], dtype=object)[kept_nodes],
+        "autor_count": autor_count,
+        "tõlkija_count": tõlkija_count,
+        "activity_start": np.asarray(columns["activity_start"])[kept_nodes],
+        "activity_end": np.asarray(columns["activity_end"])[kept_nodes],
+        "total_count": autor_count + tõlkija_count,
+        "main_role": main_role,
+        "author_lang": np.asarray(author_lang, dtype=object),
+    })
+    edges = pd.DataFrame({
+        "weight": counts,
+        "activity_start": np.asarray(columns["edge_activity_start"])[edge_order],
+        "activity_end": np.asarray(columns["edge_activity_end"])[edge_order],
+        "language": edge_language,
+    })
+    G = CompactGraph(nodes, indptr, targets, edges, work_offsets, work_ids, works, genre_offsets, genre_ids, genre_index, id_to_int)
+    print(f"Created graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
+    return G
+
+
+def empty_compact_graph(works, id_to_int=False):
+    nodes = pd.DataFrame(columns=NODE_COLUMNS)
+    edges = pd.DataFrame(columns=["weight", "activity_start", "activity_end", "language"])
+    empty = np.zeros(0, dtype=np.int64)
+    return CompactGraph(nodes, np.zeros(1, dtype=np.int64), empty, edges, np.zeros(1, dtype=np.int64), empty,
+                        works, np.zeros(1, dtype=np.int64), empty, np.array([], dtype=object), id_to_int)
@@ -1,152 +1,49 @@
 import pandas as pd
+import numpy as np
 import json
-import re
 import networkx as nx
 import itertools
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import sys
 from tqdm import tqdm
-
-def extract_person_info(person_str, role=True):
-    # Remove any titles enclosed in quotes
-    person_str = re.sub(r': ".*?"', '', person_str)
-
-    # Helper function to process individual dates
-    def process_date(date_str):
-        if not date_str:
-            return None, False  # Return None and BC indicator as False
-        date_str = date_str.strip()
-        is_bc = False
-
-        # Remove 'u. ' prefix indicating uncertainty
-        date_str = re.sub(r'^u\. ?', '', date_str)
-
-        # Check for 'e. Kr' (BC dates) and 'p. Kr' (AD dates)
-        bc_match = re.search(r'e\. ?Kr\.?', date_str, re.IGNORECASE)
-        ad_match = re.search(r'p\. ?Kr\.?', date_str, re.IGNORECASE)
-        if bc_match:
-            is_bc = True
-        elif ad_match:
-            is_bc = False  # Explicitly marked as AD
-
-        # Remove 'e. Kr' or 'p. Kr' suffixes
-        date_str = re.sub(r'(e\. ?Kr\.?|p\. ?Kr\.?)', '', date_str, flags=re.IGNORECASE).strip()
-
-        # Convert date string to integer
-        try:
-            date_int = int(date_str)
-            return date_int, is_bc
-        except ValueError:
-            return None, False  # Return None if the date is not a valid integer
-
-    # Regular expression pattern to match the entire string
-    # Matches: Name (birth_date - death_date) [role]
-    pattern = r'^(.+?)\s*\((.*?)\)\s*(?:\[(.+?)\])?$'
-
-    match = re.match(pattern, person_str)
-    if match:
-        name, date_range, role_str = match.groups()
-        name = name.strip()
-        role_str = role_str.strip().lower() if role_str and role else None
-
-        # Split the date range into birth and death dates
-        birth_date_str, _, death_date_str = date_range.partition('-')
-
-        # Process birth and death dates
-        birth_date, birth_is_bc = process_date(birth_date_str)
-        death_date, death_is_bc = process_date(death_date_str)
-
-        # If the death date is BC and the birth date is not explicitly AD, assume birth date is BC
-        if death_is_bc and not birth_is_bc and birth_date is not None:
-            birth_is_bc = True
-            birth_date = -birth_date
-        elif birth_is_bc and birth_date is not None:
-            birth_date = -birth_date
-
-        # If the death date is BC, make it negative
-        if death_is_bc and death_date is not None:
-            death_date = -death_date
-
-        if role:
-            return (name, birth_date, death_date, role_str)
-        else:
-            return (name, birth_date, death_date)
-
-    # Handle cases with only the name and optional role
-    # Matches: Name [role] or Name
-    pattern_name_role = r'^(.+?)\s*(?:\[(.+?)\])?$'
-    match = re.match(pattern_name_role, person_str)
-    if match:
-        name, role_str = match.groups()
-        name = name.strip()
-        role_str = role_str.strip().lower() if role_str and role else None
-
-        if role:
-            return (name, None, None, role_str)
-        else:
-            return (name, None, None)
-
-    # Return None values if no pattern matched
-    if role:
-        return (None, None, None, None)
-    else:
-        return (None, None, None)
-    
-
-def create_graph(erb, min_year, max_year, id_to_int=False):
+import instrumentation
+import stage_cache
+import compact_graph
+import summaries
+import communities
+import erb_loader
+import graph_tables
+import graphology_io
+import identity
+import person_parser
+import graph_base
+from person_parser import extract_person_info
+from graph_base import (
+    author_language, build_language_index, get_node_identifier, graph_columns, pair_table, person_table, process_genres,
+    record_genre_sets,
+)
+from erb_loader import ERB_PATH, GRAPH_COLUMNS, iter_erb_batches
+from graphology_io import compress_file, write_compact_graphology, write_graphology
+
+def build_graph_iterrows(df):
     """
-    Create a directed graph from the 'erb' DataFrame filtered by publication year range.
-    Edges are directed from translators to authors.
-
-    Parameters:
-    - erb: pd.DataFrame containing publication data.
-    - min_year: Minimum publication year.
-    - max_year: Maximum publication year.
-
-    Returns:
-    - G: A NetworkX DiGraph with nodes and edges representing authors and their collaborations.
+    Build the raw translator→author graph by walking the records one by one.
+    This is the reference implementation of build_graph_columnar().
     """
-    import networkx as nx
-    import itertools
-    from collections import Counter
-    from tqdm import tqdm
-
-    # Helper function to process genres
-    def process_genres(genre_str, to_remove=["ilukirjandus", "e-raamatud"]):
-        if isinstance(genre_str, str):
-            genres = genre_str.split("; ")
-            genres = [genre.split(" [")[0].split(" (")[0] for genre in genres]
-            if to_remove:
-                genres = [genre for genre in genres if genre not in to_remove]
-            return genres
-        return [None]
-
-    # Helper function to generate node identifiers
-    def get_node_identifier(name, birth_date, death_date):
-        if birth_date is not None and death_date is not None:
-            return f"{name} ({birth_date}-{death_date})"
-        elif birth_date is not None:
-            return f"{name} ({birth_date}-)"
-        elif death_date is not None:
-            return f"{name} (-{death_date})"
-        return name
-
-    # Filter the DataFrame using query for better readability
-    df = erb.query(
-        'publication_date_cleaned >= @min_year and publication_date_cleaned <= @max_year and creator.notna() and contributor.notna()'
-    )
-
-    # Initialize a directed graph
     G = nx.DiGraph()
-    
+
     for _, row in tqdm(df.iterrows(), total=df.shape[0]):
         # Extract and process person data from the dataframe row
         creators = [extract_person_info(name) for name in row['creator'].split('; ') if name.strip()]
         contributors = [extract_person_info(name) for name in row['contributor'].split('; ') if name.strip()]
         all_contributors = creators + contributors
+        instrumentation.count("person_strings_parsed", len(all_contributors))
+        instrumentation.count("parse_failures", sum(person[0] is None for person in all_contributors))
         authors = [person for person in all_contributors if person[3] == "autor"]
         translators = [person for person in all_contributors if person[3] == "tõlkija"]
-        
+
         if authors and translators:
             people = authors + translators
             # Get node identifiers for authors and translators
@@ -157,10 +54,11 @@ def create_graph(erb, min_year, max_year, id_to_int=False):
             work_info = (row['title'], current_year)
             language = row["language_original"]
             genres = set(process_genres(row["genre_keyword"]))
-            
+
             # Update edges from translators to authors
             for node_u, node_v in pairs:
                 if G.has_edge(node_u, node_v):
+                    instrumentation.count("edges_merged")
                     edge = G.edges[node_u, node_v]
                     edge['weight'] += 1
                     edge['works'].append(work_info)
@@ -169,16 +67,17 @@ def create_graph(erb, min_year, max_year, id_to_int=False):
                     edge['activity_end'] = max(edge['activity_end'], current_year)
                     edge['activity_start'] = min(edge['activity_start'], current_year)
                 else:
+                    instrumentation.count("edges_created")
                     G.add_edge(
                         node_u, node_v,
                         weight=1,
                         works=[work_info],
                         languages=[language],
-                        genres=genres,
+                        genres=set(genres),  # Copy, so that edges of the same record don't share one set
                         activity_start=current_year,
                         activity_end=current_year
                     )
-                        
+
             # Process nodes (authors and translators)
             for person in people:
                 name, birth_date, death_date, role = person if len(person) == 4 else (*person, None)
@@ -209,12 +108,335 @@ def create_graph(erb, min_year, max_year, id_to_int=False):
                 )
 
                 G.add_node(node_id, **current_node)
-                    
+
+    return G
+
+
+def build_graph_columnar(df, persons=None, pairs=None):
+    """
+    Build the raw translator→author graph from a long person table with grouped aggregations.
+    The result is identical to build_graph_iterrows(), including node, edge and attribute order.
+
+    Parameters:
+    - df: pd.DataFrame containing publication data (already filtered).
+    - persons: The person table of df, see person_table(). Computed if not given.
+    - pairs: The pair table of df, see pair_table(). Computed if not given.
+      Both tables may be restricted to a subset of the records of df.
+
+    Returns:
+    - G: A NetworkX DiGraph without the derived attributes added by finalize_graph().
+    """
+    if persons is None:
+        persons = person_table(df)
+    if pairs is None:
+        pairs = pair_table(df, persons)
+    G = nx.DiGraph()
+    if pairs.empty:
+        return G
+
+    columns = graph_columns(df, persons, pairs)
+    node_order = columns["node_order"]
+    nodes = []
+    for i, node_id in enumerate(node_order):
+        attrs = {
+            "label": node_id,
+            "date_of_birth": columns["date_of_birth"][i] or 0,
+            "date_of_death": columns["date_of_death"][i] or 0,
+        }
+        # Role counts keep the key order of incremental updates: the first seen role comes first
+        first_role = columns["first_role"][i]
+        other_role = "tõlkija" if first_role == "autor" else "autor"
+        attrs[f"{first_role}_count"] = columns[f"{first_role}_count"][i]
+        attrs["activity_start"] = columns["activity_start"][i]
+        attrs["activity_end"] = columns["activity_end"][i]
+        if columns[f"{other_role}_count"][i]:
+            attrs[f"{other_role}_count"] = columns[f"{other_role}_count"][i]
+        nodes.append((node_id, attrs))
+
+    order = columns["pair_order"]
+    bounds = columns["bounds"].tolist()
+    works = list(zip(pairs["title"].to_numpy()[order].tolist(), pairs["year"].to_numpy()[order].tolist()))
+    languages = pairs["language"].to_numpy()[order].tolist()
+    genre_sets = record_genre_sets(df)
+    record_genres = [genre_sets[record] for record in pairs["record"].to_numpy()[order].tolist()]
+    sources = node_order[columns["source"]].tolist()
+    targets = node_order[columns["target"]].tolist()
+
+    edges = []
+    for e in range(len(sources)):
+        start, end = bounds[e], bounds[e + 1]
+        genres = set(record_genres[start])
+        for record_genre_set in record_genres[start + 1:end]:
+            genres.update(record_genre_set)
+        edges.append((sources[e], targets[e], {
+            "weight": end - start,
+            "works": works[start:end],
+            "languages": languages[start:end],
+            "genres": genres,
+            "activity_start": columns["edge_activity_start"][e],
+            "activity_end": columns["edge_activity_end"][e],
+        }))
+
+    G.add_nodes_from(nodes)
+    G.add_edges_from(edges)
+    return G
+
+
+def filter_records(erb, min_year, max_year):
+    """
+    Select the records published between min_year and max_year (inclusive) that have both creators and contributors.
+    """
+    # Filter the DataFrame using query for better readability
+    return erb.query(
+        'publication_date_cleaned >= @min_year and publication_date_cleaned <= @max_year and creator.notna() and contributor.notna()'
+    )
+
+
+def create_graph(erb, min_year, max_year, id_to_int=False, engine="columnar", workers=1, graph_type="networkx", resolve_identities=False):
+    """
+    Create a directed graph from the 'erb' DataFrame filtered by publication year range.
+    Edges are directed from translators to authors.
+
+    Parameters:
+    - erb: pd.DataFrame containing publication data. The columnar engine also accepts an iterable
+      of DataFrame batches (e.g. from erb_loader.iter_erb_batches()).
+    - min_year: Minimum publication year.
+    - max_year: Maximum publication year.
+    - id_to_int: Replace node IDs with integers.
+    - engine: "columnar" (default) builds the graph with grouped aggregations over a long person table,
+      "iterrows" walks the records one by one. Both produce the same graph.
+    - workers: Number of processes that parse the records (columnar engine only), see collect_tables().
+    - graph_type: "networkx" (default) or "compact" for an array-backed compact_graph.CompactGraph (columnar engine only).
+    - resolve_identities: Merge the identifiers of the same person into one node (columnar engine only), see resolve_person_identities().
+
+    Returns:
+    - G: A NetworkX DiGraph with nodes and edges representing authors and their collaborations.
+    """
+    if engine == "columnar":
+        return create_graphs(
+            erb, [(min_year, max_year)], id_to_int=id_to_int, workers=workers, graph_type=graph_type, resolve_identities=resolve_identities
+        )[0]
+    elif engine != "iterrows":
+        raise ValueError(f"Unknown engine '{engine}', use 'columnar' or 'iterrows'")
+    elif graph_type != "networkx":
+        raise ValueError("The iterrows engine only builds NetworkX graphs")
+    elif resolve_identities:
+        raise ValueError("The iterrows engine doesn't resolve person identities")
+
+    with instrumentation.stage("load_and_parse"):
+        df = filter_records(erb, min_year, max_year)
+    instrumentation.count("records_read", len(erb))
+    instrumentation.count("records_kept", len(df))
+    with instrumentation.stage("build"):
+        G = build_graph_iterrows(df)
+    with instrumentation.stage("finalize"):
+        return finalize_graph(G, build_language_index(df), id_to_int)
+
+
+def record_tables(df, min_year, max_year):
+    """
+    Filter and parse one shard of records into its person and pair tables.
+    Runs in the worker processes of collect_tables(), so it has to stay a module-level function.
+
+    Returns:
+    - df: pd.DataFrame with the record columns of the filtered records.
+    - persons: The person table of df, see person_table().
+    - pairs: The pair table of df, see pair_table().
+    """
+    df = filter_records(df, min_year, max_year)
+    persons = person_table(df)
+    pairs = pair_table(df, persons)
+    return df[["title", "publication_date_cleaned", "language_original", "genre_keyword"]], persons, pairs
+
+
+def iter_shards(batches, n_shards):
+    """
+    Split every batch into n_shards contiguous slices of rows, keeping the record order.
+    """
+    for batch in batches:
+        instrumentation.count("records_read", len(batch))
+        bounds = np.linspace(0, len(batch), n_shards + 1).astype(int)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end > start or n_shards == 1:
+                yield batch.iloc[start:end]
+
+
+def map_shards(func, shards, workers, *args):
+    """
+    Apply func(shard, *args) to every shard, in a pool of worker processes if workers > 1.
+    Results are yielded in the order of the shards, and at most 2 * workers shards are in flight,
+    so a stream of batches isn't read into memory at once.
+    """
+    if workers <= 1:
+        for shard in shards:
+            yield func(shard, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for shard in shards:
+            pending.append(executor.submit(func, shard, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def collect_tables(batches, min_year, max_year, workers=1):
+    """
+    Filter and parse record batches one at a time into person and pair tables.
+    The person strings are dropped after parsing, so only the parsed tables and the few
+    record columns used by the graph are kept in memory.
+
+    With workers > 1, every batch is split into shards that are parsed in a pool of processes.
+    The per-shard tables are concatenated in record order, so the result doesn't depend on
+    the number of workers.
+
+    Parameters:
+    - batches: An iterable of pd.DataFrames containing publication data.
+    - min_year: Minimum publication year.
+    - max_year: Maximum publication year.
+    - workers: Number of worker processes.
+
+    Returns:
+    - df: pd.DataFrame with the record columns of the filtered records of all batches.
+    - persons: The person table of df, see person_table().
+    - pairs: The pair table of df, see pair_table().
+    """
+    frames, person_parts, pair_parts = [], [], []
+    n_records = 0
+    shards = iter_shards(batches, max(workers, 1))
+    for df, persons, pairs in map_shards(record_tables, shards, workers, min_year, max_year):
+        # Counted here rather than in record_tables(), which may run in another process
+        instrumentation.count("records_kept", len(df))
+        instrumentation.count("person_strings_parsed", len(persons))
+        instrumentation.count("parse_failures", persons["name"].isna().sum())
+        persons["record"] += n_records
+        pairs["record"] += n_records
+        frames.append(df)
+        person_parts.append(persons)
+        pair_parts.append(pairs)
+        n_records += len(df)
+
+    if not frames:
+        return collect_tables([pd.DataFrame(columns=GRAPH_COLUMNS)], min_year, max_year)
+    if len(frames) == 1:
+        return frames[0], person_parts[0], pair_parts[0]
+    return (
+        pd.concat(frames, ignore_index=True),
+        pd.concat(person_parts, ignore_index=True),
+        pd.concat(pair_parts, ignore_index=True),
+    )
+
+
+def create_graphs(erb, windows, id_to_int=False, workers=1, graph_type="networkx", resolve_identities=False):
+    """
+    Create one graph per publication year window, e.g. for diachronic analyses.
+    The records are filtered and parsed once. Each window then aggregates its own slice of the
+    per-publication pairs, so the result equals calling create_graph() for every window.
+
+    Parameters:
+    - erb: pd.DataFrame containing publication data, or an iterable of DataFrame batches
+      (e.g. from erb_loader.iter_erb_batches()).
+    - windows: A list of (min_year, max_year) tuples. Windows may overlap.
+    - id_to_int: Replace node IDs with integers.
+    - workers: Number of processes that parse the records, see collect_tables(). The graphs are the same for any number.
+    - graph_type: "networkx" (default) or "compact", see graphs_from_tables().
+    - resolve_identities: Merge the identifiers of the same person into one node, see resolve_person_identities().
+      The identities are resolved once over all windows, so a person has the same identifier in every window.
+
+    Returns:
+    - graphs: A list of graphs in the order of windows.
+    """
+    if not windows:
+        return []
+
+    batches = [erb] if isinstance(erb, pd.DataFrame) else erb
+    with instrumentation.stage("load_and_parse"):
+        tables = collect_tables(batches, min(start for start, _ in windows), max(end for _, end in windows), workers)
+    if resolve_identities:
+        tables, _ = resolve_person_identities(tables)
+    return graphs_from_tables(tables, windows, id_to_int, graph_type)
+
+
+def resolve_person_identities(tables, identities=None):
+    """
+    Replace the person identifiers that name the same person (e.g. 'Name (1850-1910)', 'Name (1850-)' and 'Name')
+    with one canonical identifier, see identity.build_identities().
+
+    Parameters:
+    - tables: The (df, persons, pairs) tuple from collect_tables().
+    - identities: The canonical-id mapping of the same tables (e.g. from the stage cache), built if not given.
+
+    Returns:
+    - tables: The tables with canonical identifiers, see identity.apply_identities().
+    - identities: The canonical-id mapping.
+    """
+    print("Resolving person identities")
+    with instrumentation.stage("resolve_identities"):
+        if identities is None:
+            identities = identity.build_identities(tables[1])
+        return identity.apply_identities(tables, identities), identities
+
+
+def graphs_from_tables(tables, windows, id_to_int=False, graph_type="networkx"):
+    """
+    Build one graph per publication year window from parsed tables, see create_graphs().
+
+    Parameters:
+    - tables: The (df, persons, pairs) tuple from collect_tables(), covering all windows.
+    - windows: A list of (min_year, max_year) tuples.
+    - id_to_int: Replace node IDs with integers.
+    - graph_type: "networkx" (default) builds NetworkX DiGraphs, "compact" builds array-backed
+      compact_graph.CompactGraphs with the same nodes, edges and attributes, which take a fraction of the memory.
+
+    Returns:
+    - graphs: A list of graphs in the order of windows.
+    """
+    if graph_type == "compact":
+        graphs = []
+        for min_year, max_year in windows:
+            with instrumentation.stage("build"):
+                graphs.append(compact_graph.compact_graph(tables, min_year, max_year, id_to_int))
+        return graphs
+    elif graph_type != "networkx":
+        raise ValueError(f"Unknown graph type '{graph_type}', use 'networkx' or 'compact'")
+
+    df, persons, pairs = tables
+    record_years = df["publication_date_cleaned"].to_numpy()
+    person_years = record_years[persons["record"].to_numpy()]
+    pair_years = pairs["year"].to_numpy()
+
+    graphs = []
+    for min_year, max_year in windows:
+        window_persons = persons[(person_years >= min_year) & (person_years <= max_year)]
+        window_pairs = pairs[(pair_years >= min_year) & (pair_years <= max_year)]
+        with instrumentation.stage("build"):
+            G = build_graph_columnar(df, window_persons, window_pairs)
+        with instrumentation.stage("finalize"):
+            graphs.append(finalize_graph(G, build_language_index(df, window_persons), id_to_int))
+    return graphs
+
+
+def finalize_graph(G, language_index, id_to_int=False):
+    """
+    Remove self-loops and isolated nodes and derive the summary attributes of nodes and edges.
+
+    Parameters:
+    - G: The raw graph from build_graph_columnar() or build_graph_iterrows().
+    - language_index: The person→language index of the same records, see build_language_index().
+    - id_to_int: Replace node IDs with integers.
+
+    Returns:
+    - G: The finished graph.
+    """
     # Remove self-loops (if any)
+    instrumentation.count("self_loops_removed", nx.number_of_selfloops(G))
     G.remove_edges_from(nx.selfloop_edges(G))
 
     # Remove isolated nodes (those with no edges):
     isolated_nodes = [n for n, deg in G.degree() if deg == 0]
+    instrumentation.count("isolated_nodes_removed", len(isolated_nodes))
     G.remove_nodes_from(isolated_nodes)
 
     print("Updating node attributes")
@@ -230,14 +452,11 @@ def create_graph(erb, min_year, max_year, id_to_int=False):
         
         # Set 'author_lang' based on the main role
         if G.nodes[node_id]["main_role"] == "autor":
-            name = attributes.get('label_short', node_id)  # Use short label
-            author_lang_series = df[df['creator'].str.contains(name, regex=False)]['language_original']
-            author_lang = author_lang_series.mode()
-            G.nodes[node_id]["author_lang"] = author_lang.iloc[0] if not author_lang.empty else "und"
+            G.nodes[node_id]["author_lang"] = author_language(language_index, node_id)
         elif G.nodes[node_id]["main_role"] == "tõlkija":
             G.nodes[node_id]["author_lang"] = "tõlkija"
     
-    print("Updating node attributes")
+    print("Updating edge attributes")
     # Update edge attributes
     for edge in tqdm(G.edges):
         edge_data = G.edges[edge]
@@ -261,7 +480,8 @@ def nx_to_graphology(G):
     - G: NetworkX Graph object.
 
     Returns:
-    - graph_data: A dictionary containing 'nodes' and 'edges' suitable for JSON serialization.
+    - graph_data: A dictionary containing 'nodes' and 'edges' suitable for JSON serialization, and the graph
+      attributes as 'attributes' if G has any.
     """
     nodes = []
     edges = []
@@ -340,6 +560,8 @@ def nx_to_graphology(G):
         'nodes': nodes,
         'edges': edges
     }
+    if G.graph:
+        graph_data['attributes'] = G.graph
     return graph_data
 
 
@@ -358,7 +580,7 @@ def simplify_graph_for_gexf(G):
     simplified_G = nx.Graph()
 
     # List of node attributes to keep
-    node_attrs_to_keep = ['main_role', 'author_lang', 'total_count', 'label', 'label_short', 'activity_start', 'activity_end']
+    node_attrs_to_keep = ['main_role', 'author_lang', 'total_count', 'label', 'label_short', 'activity_start', 'activity_end', 'community']
 
     # List of edge attributes to keep
     edge_attrs_to_keep = ['activity_start', 'activity_end', 'language']
@@ -376,33 +598,207 @@ def simplify_graph_for_gexf(G):
     return simplified_G
 
 
-if __name__ == "__main__":
-    if len(sys.argv) == 4:
-        key = sys.argv[1]
-        min_year = int(sys.argv[2])
-        max_year = int(sys.argv[3])
-    else:
-        key = "data"
-        min_year = 1800
-        max_year = 2025
-        print("Creating graph from timerange 1800 to 2025. Use 'python create_graph.py <key> <min_year> <max_year>' to change the default values")
+def summarize_graph(G, top_k=summaries.TOP_K):
+    """
+    Add the ego summaries of the nodes and the facet tables of the graph, see summaries.add_summaries().
+    """
+    print("Summarizing nodes and facets")
+    with instrumentation.stage("summarize"):
+        return summaries.add_summaries(G, top_k)
 
-    print("Loading data")
-    erb_main = pd.read_parquet("../data/raw/erb_all_books.parquet")
-    df = erb_main.query('is_fiction == True and language == "est" and language_original.notna()')
 
-    print("Creating graph")
-    G = create_graph(df, min_year, max_year, id_to_int=True)
+def detect_communities(graphs, seed=communities.SEED, warm_start=False, workers=1):
+    """
+    Add the Louvain communities and their language metrics to the graphs of year windows, see communities.add_communities().
+    The windows are detected in parallel with workers processes, all with the same seed.
+    """
+    print("Detecting communities")
+    with instrumentation.stage("communities"):
+        return communities.add_communities(graphs, seed, warm_start=warm_start, workers=workers)
 
-    print("Converting to JSON")
-    graph_data = nx_to_graphology(G)
 
+def export_graph(G, key, compact=False, compress=(), backend="json"):
+    """
+    Write the graph as Graphology JSON to ../data/<key>.json and as GEXF to ../data/gephi/<key>_for_gephi.gexf.
+    With compact=True the compact format (see graphology_io.compact_graphology()) is also written to ../data/<key>_compact.json.
+    compress lists the precompressed copies ("gz", "br") to write next to the JSON files.
+    backend is the JSON encoder of the JSON files, see graphology_io.get_encoder().
+    G may be a NetworkX graph or a compact_graph.CompactGraph.
+    """
     print("Writing JSON")
-    with open(f"../data/{key}.json", "w", encoding="utf8") as f:
-        json.dump(graph_data, f)
+    with instrumentation.stage("write_json"):
+        write_graphology(G, f"../data/{key}.json", backend)
+        compress_file(f"../data/{key}.json", compress)
+        if compact:
+            write_compact_graphology(G, f"../data/{key}_compact.json", backend)
+            compress_file(f"../data/{key}_compact.json", compress)
 
     print("Simplifying graph for Gephi")
-    G_gephi = simplify_graph_for_gexf(G)
-    nx.write_gexf(G_gephi, f"../data/gephi/{key}_for_gephi.gexf")
+    with instrumentation.stage("write_gexf"):
+        G_gephi = simplify_graph_for_gexf(G)
+        nx.write_gexf(G_gephi, f"../data/gephi/{key}_for_gephi.gexf")
+
+
+def export_tables(G, key):
+    """
+    Write the nodes, edges and works of the graph as Parquet datasets partitioned by decade to
+    ../data/tables/<key>/, see graph_tables.write_graph_tables().
+    """
+    print(f"Writing Parquet tables to ../data/tables/{key}")
+    with instrumentation.stage("write_parquet"):
+        return graph_tables.write_graph_tables(G, f"../data/tables/{key}")
+
+
+def pipeline_keys(path, min_year, max_year, compact=False, compress=(), graph_type="networkx", top_k=None, community_seed=None, resolve_identities=False,
+                  backend="json"):
+    """
+    Compute the stage cache keys of the pipeline for an input file and year range. Every key covers the
+    input file content, the fiction/language filter, the year range and the code of its stage.
+    top_k is the number of partners of the ego summaries, None if they are not added.
+    community_seed is the seed of the community detection, None if communities are not detected.
+    resolve_identities adds the 'identities' stage (the canonical-id mapping of the tables) before the graph.
+    backend is the JSON encoder of the export; "auto" is keyed by the encoder it resolves to.
+
+    Returns:
+    - keys: A dict with the keys of the 'tables', 'identities', 'graph' and 'export' stages.
+    """
+    inputs = {
+        "input": stage_cache.file_digest(path),
+        "filter": {"is_fiction": True, "language": "est", "min_year": min_year, "max_year": max_year},
+    }
+    parse_code = stage_cache.code_version(erb_loader, person_parser, graph_base, sys.modules[__name__])
+    tables_key = stage_cache.stage_key(stage="tables", code=parse_code, **inputs)
+    identities_key = stage_cache.stage_key(
+        stage="identities", tables=tables_key, code=stage_cache.code_version(person_parser, graph_base, identity),
+    )
+    graph_key = stage_cache.stage_key(
+        stage="graph", tables=tables_key, id_to_int=True, graph_type=graph_type, code=stage_cache.code_version(graph_base, compact_graph),
+        identities=identities_key if resolve_identities else None,
+    )
+    export_key = stage_cache.stage_key(
+        stage="export", graph=graph_key, code=stage_cache.code_version(graphology_io, summaries, communities),
+        compact=compact, compress=sorted(compress), top_k=top_k, community_seed=community_seed,
+        backend=graphology_io.resolve_backend(backend),
+    )
+    return {"tables": tables_key, "identities": identities_key, "graph": graph_key, "export": export_key}
 
-    print(f"Done! Check ../data/{key}.json and ../data/gephi/{key}_for_gephi.gexf")
\ No newline at end of file
+
+def export_files(key, compact=False, compress=()):
+    """
+    Map the names of the files written by export_graph() to their paths.
+    """
+    files = {"graph.json": f"../data/{key}.json", "graph.gexf": f"../data/gephi/{key}_for_gephi.gexf"}
+    if compact:
+        files["compact.json"] = f"../data/{key}_compact.json"
+    for name, path in list(files.items()):
+        if name.endswith(".json"):
+            files.update({f"{name}.{compression}": f"{path}.{compression}" for compression in compress})
+    return files
+
+
+def cached_pipeline(key, min_year, max_year, compact=False, compress=(), workers=1, path=ERB_PATH, graph_type="networkx", top_k=None,
+                    community_seed=None, parquet=False, resolve_identities=False, backend="json"):
+    """
+    Run create_graph.py's pipeline, skipping every stage whose inputs are unchanged since a previous run:
+    the exported files are copied from the cache, or else the graph is loaded, or else the parsed tables.
+    The results are the same as without the cache, see stage_cache.py.
+    The Parquet tables (parquet=True, see export_tables()) are datasets of partition directories and not
+    cached, so they are always written from the (cached) graph.
+
+    Returns:
+    - G: The graph, or None if the exported files were restored without loading it.
+    """
+    keys = pipeline_keys(path, min_year, max_year, compact, compress, graph_type, top_k, community_seed, resolve_identities, backend)
+    files = export_files(key, compact, compress)
+    restored = stage_cache.restore_files("export", keys["export"], files)
+    if restored:
+        print("Restored the exported files from the cache")
+        if not parquet:
+            return None
+
+    G = stage_cache.load_artifact("graph", keys["graph"])
+    if G is None:
+        tables = stage_cache.load_artifact("tables", keys["tables"])
+        if tables is None:
+            print("Loading data and creating graph")
+            with instrumentation.stage("load_and_parse"):
+                tables = collect_tables(iter_erb_batches(path, min_year, max_year), min_year, max_year, workers)
+            stage_cache.save_artifact("tables", keys["tables"], tables)
+        else:
+            print("Loaded the parsed records from the cache, creating graph")
+        if resolve_identities:
+            identities = stage_cache.load_artifact("identities", keys["identities"])
+            if identities is not None:
+                print("Loaded the person identities from the cache")
+            tables, resolved = resolve_person_identities(tables, identities)
+            if identities is None:
+                stage_cache.save_artifact("identities", keys["identities"], resolved)
+        G = graphs_from_tables(tables, [(min_year, max_year)], id_to_int=True, graph_type=graph_type)[0]
+        stage_cache.save_artifact("graph", keys["graph"], G)
+    else:
+        print("Loaded the graph from the cache")
+
+    if community_seed is not None:
+        detect_communities([G], community_seed)
+    if not restored:
+        if top_k is not None:
+            summarize_graph(G, top_k)
+        export_graph(G, key, compact=compact, compress=compress, backend=backend)
+        stage_cache.save_files("export", keys["export"], files)
+    if parquet:
+        export_tables(G, key)
+    return G
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the translator network graph from the ERB data.")
+    parser.add_argument("key", nargs="?", default="data", help="name of the output files (default: data)")
+    parser.add_argument("min_year", nargs="?", type=int, default=1800, help="minimum publication year (default: 1800)")
+    parser.add_argument("max_year", nargs="?", type=int, default=2025, help="maximum publication year (default: 2025)")
+    parser.add_argument("--compact", action="store_true", help="also write ../data/<key>_compact.json with interned works and strings")
+    parser.add_argument("--compress", nargs="+", choices=["gz", "br"], default=[], help="also write precompressed copies of the JSON files")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes that parse the records (default: 1)")
+    parser.add_argument("--graph-type", choices=["networkx", "compact"], default="networkx", help="in-memory graph representation; compact is array-backed and uses less memory (default: networkx)")
+    parser.add_argument("--summaries", action="store_true", help="add per-node ego summaries, facet tables and a per-year edge index to the JSON export")
+    parser.add_argument("--top-k", type=int, default=summaries.TOP_K, help=f"number of partners in the ego summaries (default: {summaries.TOP_K})")
+    parser.add_argument("--communities", action="store_true", help="detect Louvain communities and write their ids as the node attribute 'community' and their language metrics to the exports")
+    parser.add_argument("--seed", type=int, default=communities.SEED, help=f"seed of the community detection (default: {communities.SEED})")
+    parser.add_argument("--resolve-identities", action="store_true", help="merge the identifiers of the same person (e.g. with and without dates) into one node")
+    parser.add_argument("--parquet", action="store_true", help="also write the nodes, edges and works as Parquet datasets partitioned by decade to ../data/tables/<key>/")
+    parser.add_argument("--backend", choices=["json", "orjson", "auto"], default="json", help="JSON encoder of the JSON files; orjson is faster and writes compact JSON (default: json)")
+    parser.add_argument("--report", help="write a JSON report with the stage timings and counters to this path")
+    parser.add_argument("--no-cache", action="store_true", help=f"don't read or write the stage cache in {stage_cache.CACHE_DIR}")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    key, min_year, max_year = args.key, args.min_year, args.max_year
+    if (key, min_year, max_year) == ("data", 1800, 2025):
+        print("Creating graph from timerange 1800 to 2025. Use 'python create_graph.py <key> <min_year> <max_year>' to change the default values")
+
+    with instrumentation.run("create_graph", args.report, **vars(args)):
+        if args.no_cache:
+            print("Loading data and creating graph")
+            batches = iter_erb_batches(ERB_PATH, min_year, max_year)
+            G = create_graph(
+                batches, min_year, max_year, id_to_int=True, workers=args.workers, graph_type=args.graph_type,
+                resolve_identities=args.resolve_identities,
+            )
+            if args.communities:
+                detect_communities([G], args.seed)
+            if args.summaries:
+                summarize_graph(G, args.top_k)
+            export_graph(G, key, compact=args.compact, compress=args.compress, backend=args.backend)
+            if args.parquet:
+                export_tables(G, key)
+        else:
+            cached_pipeline(
+                key, min_year, max_year, compact=args.compact, compress=args.compress, workers=args.workers,
+                graph_type=args.graph_type, top_k=args.top_k if args.summaries else None,
+                community_seed=args.seed if args.communities else None, parquet=args.parquet,
+                resolve_identities=args.resolve_identities, backend=args.backend,
+            )
+            stage_cache.evict()
+
+    print(f"Done! Check ../data/{key}.json and ../data/gephi/{key}_for_gephi.gexf")
@@ -0,0 +1,58 @@
+import pyarrow.dataset as ds
+
+# Path of the curated ENB export, relative to network/src
+ERB_PATH = "../data/raw/erb_all_books.parquet"
+
+# Columns needed to build the graph
+GRAPH_COLUMNS = [
+    "creator", "contributor", "title", "publication_date_cleaned",
+    "language_original", "genre_keyword", "is_fiction", "language"
+]
+
+# Column with the stable record identifiers of the export (e.g. 'b15702388')
+RECORD_ID_COLUMN = "id"
+
+
+def fiction_filter(min_year=None, max_year=None, language="est"):
+    """
+    Build the record filter of the graph as a pyarrow expression: fiction in the given language,
+    with a known original language and optionally published between min_year and max_year.
+    The expression is pushed down to the Parquet reader, which skips row groups by their statistics.
+    """
+    expression = (ds.field("is_fiction") == True) & (ds.field("language") == language)
+    expression &= ds.field("language_original").is_valid()
+    if min_year is not None:
+        expression &= ds.field("publication_date_cleaned") >= min_year
+    if max_year is not None:
+        expression &= ds.field("publication_date_cleaned") <= max_year
+    return expression
+
+
+def iter_erb_batches(path=ERB_PATH, min_year=None, max_year=None, columns=GRAPH_COLUMNS, batch_size=100_000):
+    """
+    Stream the filtered records of the ERB Parquet file as DataFrames.
+    Only the given columns are read, so peak memory is bounded by the batch size.
+
+    Parameters:
+    - path: Path of the Parquet file.
+    - min_year: Minimum publication year (optional).
+    - max_year: Maximum publication year (optional).
+    - columns: Columns to read.
+    - batch_size: Maximum number of rows read at once.
+
+    Yields:
+    - pd.DataFrame batches with the records that pass fiction_filter().
+    """
+    dataset = ds.dataset(path, format="parquet")
+    scanner = dataset.scanner(columns=columns, filter=fiction_filter(min_year, max_year), batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def load_erb(path=ERB_PATH, min_year=None, max_year=None, columns=GRAPH_COLUMNS):
+    """
+    Load the filtered records of the ERB Parquet file into one DataFrame, see iter_erb_batches().
+    """
+    dataset = ds.dataset(path, format="parquet")
+    return dataset.to_table(columns=columns, filter=fiction_filter(min_year, max_year)).to_pandas()
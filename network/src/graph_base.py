@@ -0,0 +1,218 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from person_parser import extract_person_info, parse_person_series
+
+
+def process_genres(genre_str, to_remove=["ilukirjandus", "e-raamatud"]):
+    """
+    Split a 'genre_keyword' string into a list of genres without qualifiers.
+
+    Parameters:
+    - genre_str: The "; "-joined genre string (or a missing value).
+    - to_remove: Genres that are dropped from the result.
+
+    Returns:
+    - A list of genres, or [None] if the value is missing.
+    """
+    if isinstance(genre_str, str):
+        genres = genre_str.split("; ")
+        genres = [genre.split(" [")[0].split(" (")[0] for genre in genres]
+        if to_remove:
+            genres = [genre for genre in genres if genre not in to_remove]
+        return genres
+    return [None]
+
+
+def get_node_identifier(name, birth_date, death_date):
+    """
+    Build the node identifier of a person, e.g. 'Name (1850-1910)'.
+    """
+    if birth_date is not None and death_date is not None:
+        return f"{name} ({birth_date}-{death_date})"
+    elif birth_date is not None:
+        return f"{name} ({birth_date}-)"
+    elif death_date is not None:
+        return f"{name} (-{death_date})"
+    return name
+
+
+def person_table(df):
+    """
+    Explode the 'creator' and 'contributor' columns into a long table with one row per person string.
+    Every distinct person string is parsed only once, see parse_person_series().
+
+    Parameters:
+    - df: pd.DataFrame containing publication data (already filtered).
+
+    Returns:
+    - persons: pd.DataFrame with the columns 'record' (row position in df), 'position' (order of the
+      person within the record, creators first), 'column' ('creator' or 'contributor'), 'person'
+      (node identifier), 'name', 'date_of_birth', 'date_of_death' and 'role'.
+      Rows are ordered by record and position.
+    """
+    records = np.arange(len(df))
+    parts = []
+    for column_order, column in enumerate(["creator", "contributor"]):
+        parsed = parse_person_series(pd.Series(df[column].to_numpy(dtype=object), index=records))
+        parts.append(parsed.assign(column_order=column_order, column=column))
+    persons = pd.concat(parts, ignore_index=True)
+    persons = persons.sort_values(["record", "column_order"], kind="stable")
+
+    codes, uniques = pd.factorize(persons["raw"])
+    identifiers = np.array([get_node_identifier(*extract_person_info(person_str)[:3]) for person_str in uniques], dtype=object)
+
+    return pd.DataFrame({
+        "record": persons["record"].to_numpy(),
+        "position": persons.groupby("record").cumcount().to_numpy(),
+        "column": persons["column"].to_numpy(),
+        "person": identifiers[codes],
+        "name": persons["name"].to_numpy(),
+        "date_of_birth": persons["date_of_birth"].to_numpy(),
+        "date_of_death": persons["date_of_death"].to_numpy(),
+        "role": persons["role"].to_numpy(),
+    })
+
+
+def pair_table(df, persons):
+    """
+    Cross-join translators and authors of each record into translator→author pairs.
+
+    Parameters:
+    - df: pd.DataFrame containing publication data (already filtered).
+    - persons: The person table of df, see person_table().
+
+    Returns:
+    - pairs: pd.DataFrame with the columns 'record', 'translator', 'author', 'year', 'title' and 'language',
+      in the same order as the record-by-record itertools.product() of translators and authors.
+    """
+    authors = persons.loc[persons["role"] == "autor", ["record", "position", "person"]]
+    translators = persons.loc[persons["role"] == "tõlkija", ["record", "position", "person"]]
+    pairs = translators.merge(authors, on="record", suffixes=("_translator", "_author"))
+    pairs = pairs.sort_values(["record", "position_translator", "position_author"], kind="stable")
+    records = pairs["record"].to_numpy()
+
+    return pd.DataFrame({
+        "record": records,
+        "translator": pairs["person_translator"].to_numpy(),
+        "author": pairs["person_author"].to_numpy(),
+        "year": df["publication_date_cleaned"].to_numpy()[records],
+        "title": df["title"].to_numpy(dtype=object)[records],
+        "language": df["language_original"].to_numpy(dtype=object)[records],
+    })
+
+
+def build_language_index(df, persons=None):
+    """
+    Build an inverted index from person identifiers to the original languages of their works.
+    Only the 'creator' column is indexed and every record is counted once per person.
+
+    Parameters:
+    - df: pd.DataFrame containing publication data (already filtered).
+    - persons: The person table of df, see person_table(). Computed if not given.
+
+    Returns:
+    - language_index: A dict mapping node identifiers to a Counter of 'language_original' values.
+    """
+    if persons is None:
+        persons = person_table(df)
+
+    creators = persons.loc[persons["column"] == "creator", ["record", "person"]].drop_duplicates()
+    creators = creators.assign(language=df["language_original"].to_numpy(dtype=object)[creators["record"].to_numpy()])
+    creators = creators[creators["language"].notna()]
+
+    language_index = {}
+    counts = creators.groupby(["person", "language"], sort=False).size()
+    for (person, language), count in counts.items():
+        language_index.setdefault(person, Counter())[language] = count
+    return language_index
+
+
+def author_language(language_index, person):
+    """
+    Look up the most common original language of a person's works in the language index.
+    Ties are resolved alphabetically, like pd.Series.mode(). Returns "und" for unknown persons.
+    """
+    languages = language_index.get(person)
+    if not languages:
+        return "und"
+    top_count = max(languages.values())
+    return min(language for language, count in languages.items() if count == top_count)
+
+
+def graph_columns(df, persons, pairs):
+    """
+    Aggregate the person and pair tables into the node and edge columns of the raw graph.
+    Shared by create_graph.build_graph_columnar() and compact_graph.compact_graph().
+
+    Parameters:
+    - df: pd.DataFrame containing publication data (already filtered).
+    - persons: The person table of df, see person_table().
+    - pairs: The (non-empty) pair table of df, see pair_table().
+
+    Returns:
+    - columns: A dict with the node columns 'node_order' (identifiers in the order they are first touched
+      by an edge), 'date_of_birth', 'date_of_death', 'first_role', 'autor_count', 'tõlkija_count',
+      'activity_start' and 'activity_end', and the edge columns 'source' and 'target' (indices in node_order),
+      'edge_activity_start', 'edge_activity_end', 'pair_order' (pair positions grouped by edge) and
+      'bounds' (offsets of each edge's pairs in pair_order). Edges are in the order they are first created.
+    """
+    # Nodes in the order they are first touched by an edge (translator before author)
+    endpoints = np.column_stack([pairs["translator"].to_numpy(), pairs["author"].to_numpy()]).ravel()
+    node_order = pd.unique(endpoints)
+    node_index = pd.Index(node_order)
+
+    # People of the records that produced edges: authors first, then translators
+    people = persons[persons["record"].isin(pairs["record"].unique()) & persons["role"].isin(["autor", "tõlkija"])]
+    people = people.assign(
+        role_order=(people["role"] == "tõlkija").astype(int),
+        year=df["publication_date_cleaned"].to_numpy()[people["record"].to_numpy()],
+        node=node_index.get_indexer(people["person"]),
+    ).sort_values(["record", "role_order", "position"], kind="stable")
+
+    by_node = people.groupby("node", sort=True)
+    last = people.drop_duplicates("node", keep="last").sort_values("node")
+    role_counts = people.groupby(["node", "role"]).size().unstack(fill_value=0)
+    role_counts = role_counts.reindex(columns=["autor", "tõlkija"], fill_value=0).to_dict("list")
+
+    # Edges in the order they are first created
+    source = node_index.get_indexer(pairs["translator"])
+    target = node_index.get_indexer(pairs["author"])
+    edge_codes, _ = pd.factorize(source.astype(np.int64) * len(node_order) + target)
+    n_edges = edge_codes.max() + 1
+    instrumentation.count("edges_created", n_edges)
+    instrumentation.count("edges_merged", len(pairs) - n_edges)
+    pair_order = np.argsort(edge_codes, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(edge_codes, minlength=n_edges))])
+    first = pair_order[bounds[:-1]]
+    by_edge = pairs.groupby(edge_codes, sort=True)
+
+    return {
+        "node_order": node_order,
+        "date_of_birth": last["date_of_birth"].tolist(),
+        "date_of_death": last["date_of_death"].tolist(),
+        "first_role": people.drop_duplicates("node", keep="first").sort_values("node")["role"].tolist(),
+        "autor_count": role_counts["autor"],
+        "tõlkija_count": role_counts["tõlkija"],
+        "activity_start": by_node["year"].min().tolist(),
+        "activity_end": by_node["year"].max().tolist(),
+        "source": source[first],
+        "target": target[first],
+        "edge_activity_start": by_edge["year"].min().tolist(),
+        "edge_activity_end": by_edge["year"].max().tolist(),
+        "pair_order": pair_order,
+        "bounds": bounds,
+    }
+
+
+def record_genre_sets(df):
+    """
+    Return the set of processed genres of every record of df. Sets are computed once per distinct genre string
+    and shared between records with the same string.
+    """
+    genre_codes, genre_strings = pd.factorize(df["genre_keyword"], use_na_sentinel=False)
+    genre_sets = [set(process_genres(genre_str)) for genre_str in genre_strings]
+    return [genre_sets[code] for code in genre_codes.tolist()]
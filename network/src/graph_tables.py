@@ -0,0 +1,185 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Tables written by write_graph_tables(), each partitioned by decade
+TABLES = ["nodes", "edges", "edge_works"]
+DECADE_PARTITIONING = ds.partitioning(pa.schema([("decade", pa.int16())]), flavor="hive")
+
+
+def years(values):
+    """
+    Convert years to a nullable integer column. The graph stores unknown dates as 0 (or None), which become missing.
+    """
+    return pd.array([value or None for value in values], dtype="Int16")
+
+
+def decade_column(values):
+    """
+    Return the decades of years (e.g. 1984 → 1980) as the partition column, -1 for missing years.
+    """
+    decade = pd.Series(values, dtype="Int64") // 10 * 10
+    return decade.fillna(-1).to_numpy(dtype=np.int16)
+
+
+def node_keys(keys):
+    """
+    Return node keys as a column: int64 for graphs from create_graph(..., id_to_int=True), strings otherwise.
+    """
+    keys = list(keys)
+    if all(isinstance(key, (int, np.integer)) for key in keys):
+        return np.array(keys, dtype=np.int64)
+    return pd.array([str(key) for key in keys], dtype="string")
+
+
+def node_frame(G):
+    """
+    Flatten the nodes of a graph into a table with one row per node.
+
+    Parameters:
+    - G: A NetworkX graph or a compact_graph.CompactGraph from create_graph().
+
+    Returns:
+    - nodes: pd.DataFrame with the columns 'node', 'label', 'date_of_birth', 'date_of_death' (missing if unknown),
+      'autor_count', 'tõlkija_count', 'total_count', 'main_role', 'author_lang', 'activity_start', 'activity_end',
+      'community' (only if the communities were detected) and 'decade' (of 'activity_start').
+    """
+    keys, attributes = [], []
+    for node, attrs in G.nodes(data=True):
+        keys.append(node)
+        attributes.append(attrs)
+
+    nodes = pd.DataFrame({
+        "node": node_keys(keys),
+        "label": pd.array([attrs.get("label") for attrs in attributes], dtype="string"),
+        "date_of_birth": years(attrs.get("date_of_birth") for attrs in attributes),
+        "date_of_death": years(attrs.get("date_of_death") for attrs in attributes),
+        "autor_count": np.array([attrs.get("autor_count", 0) for attrs in attributes], dtype=np.int32),
+        "tõlkija_count": np.array([attrs.get("tõlkija_count", 0) for attrs in attributes], dtype=np.int32),
+        "total_count": np.array([attrs.get("total_count", 0) for attrs in attributes], dtype=np.int32),
+        "main_role": pd.Categorical([attrs.get("main_role") for attrs in attributes]),
+        "author_lang": pd.Categorical([attrs.get("author_lang") for attrs in attributes]),
+        "activity_start": years(attrs.get("activity_start") for attrs in attributes),
+        "activity_end": years(attrs.get("activity_end") for attrs in attributes),
+    })
+    if any("community" in attrs for attrs in attributes):
+        nodes["community"] = pd.array([attrs.get("community") for attrs in attributes], dtype="Int32")
+    nodes["decade"] = decade_column(nodes["activity_start"])
+    return nodes
+
+
+def edge_frame(G):
+    """
+    Flatten the edges of a graph into a table with one row per translator→author edge.
+
+    Returns:
+    - edges: pd.DataFrame with the columns 'translator', 'author' (node keys), 'weight', 'language' (the most
+      common original language), 'genres' (list of the genres of the edge), 'activity_start', 'activity_end'
+      and 'decade' (of 'activity_start').
+    """
+    sources, targets, attributes = [], [], []
+    for u, v, attrs in G.edges(data=True):
+        sources.append(u)
+        targets.append(v)
+        attributes.append(attrs)
+
+    edges = pd.DataFrame({
+        "translator": node_keys(sources),
+        "author": node_keys(targets),
+        "weight": np.array([attrs.get("weight", 1) for attrs in attributes], dtype=np.int32),
+        "language": pd.Categorical([attrs.get("language") for attrs in attributes]),
+        "genres": pd.Series([list(attrs.get("genres", [])) for attrs in attributes], dtype=object),
+        "activity_start": years(attrs.get("activity_start") for attrs in attributes),
+        "activity_end": years(attrs.get("activity_end") for attrs in attributes),
+    })
+    edges["decade"] = decade_column(edges["activity_start"])
+    return edges
+
+
+def edge_work_frame(G):
+    """
+    Flatten the works of the edges of a graph into a long table with one row per work and edge,
+    so that analyses over works (e.g. translation year against the dates of the translator and author)
+    are vectorized queries instead of loops over G.edges[edge]["works"].
+
+    Returns:
+    - edge_works: pd.DataFrame with the columns 'translator', 'author' (node keys), 'title', 'year',
+      'language' (original language of the work), 'genres' (list of the genres of the edge, as the graph
+      keeps the genres per edge) and 'decade' (of 'year').
+    """
+    sources, targets, titles, work_years, languages, genres = [], [], [], [], [], []
+    for u, v, attrs in G.edges(data=True):
+        works = attrs.get("works", [])
+        sources.extend([u] * len(works))
+        targets.extend([v] * len(works))
+        titles.extend(title for title, _ in works)
+        work_years.extend(year for _, year in works)
+        languages.extend(attrs.get("languages", []))
+        edge_genres = list(attrs.get("genres", []))
+        genres.extend([edge_genres] * len(works))
+
+    edge_works = pd.DataFrame({
+        "translator": node_keys(sources),
+        "author": node_keys(targets),
+        "title": pd.array(titles, dtype="string"),
+        "year": years(work_years),
+        "language": pd.Categorical(languages),
+        "genres": pd.Series(genres, dtype=object),
+    })
+    edge_works["decade"] = decade_column(edge_works["year"])
+    return edge_works
+
+
+def write_table(frame, path):
+    """
+    Write a table as a Parquet dataset partitioned by decade (<path>/decade=1980/part-0.parquet),
+    replacing any previous dataset at path.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    ds.write_dataset(table, path, format="parquet", partitioning=DECADE_PARTITIONING, existing_data_behavior="overwrite_or_ignore")
+
+
+def write_graph_tables(G, output_dir):
+    """
+    Write the nodes, edges and works of a graph as Parquet datasets partitioned by decade, see
+    node_frame(), edge_frame() and edge_work_frame(). Read them with read_graph_table() or pd.read_parquet().
+
+    Parameters:
+    - G: A NetworkX graph or a compact_graph.CompactGraph from create_graph().
+    - output_dir: The directory of the datasets, e.g. ../data/tables/<key>.
+
+    Returns:
+    - paths: A dict mapping the table names to their dataset directories.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    frames = {"nodes": node_frame(G), "edges": edge_frame(G), "edge_works": edge_work_frame(G)}
+    paths = {}
+    for name, frame in frames.items():
+        paths[name] = os.path.join(output_dir, name)
+        write_table(frame, paths[name])
+    return paths
+
+
+def read_graph_table(output_dir, name, decades=None, columns=None):
+    """
+    Read a table written by write_graph_tables(), reading only the partitions of the given decades.
+
+    Parameters:
+    - output_dir: The directory of the datasets.
+    - name: "nodes", "edges" or "edge_works".
+    - decades: A list of decades to read (e.g. [1950, 1960]), all if not given.
+    - columns: A list of columns to read, all if not given.
+
+    Returns:
+    - table: pd.DataFrame.
+    """
+    if name not in TABLES:
+        raise ValueError(f"Unknown table '{name}', use one of {TABLES}")
+    dataset = ds.dataset(os.path.join(output_dir, name), format="parquet", partitioning=DECADE_PARTITIONING)
+    expression = ds.field("decade").isin(decades) if decades is not None else None
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
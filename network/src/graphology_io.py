@@ -0,0 +1,466 @@
+import gzip
+import json
+import re
+import numpy as np
+import networkx as nx
+from collections import Counter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Placeholder attributes added to nodes and edges that don't have them
+NODE_DEFAULTS = {"x": 0.0, "y": 0.0, "size": 1.0, "color": "#000000"}
+EDGE_DEFAULTS = {"size": 1.0, "color": "#000000"}
+
+# Edge attributes that split_graphology() moves out of the layout part
+EDGE_METADATA = ("works", "languages", "genres")
+
+# Value of the 'format' key of compact documents, see compact_graphology()
+COMPACT_FORMAT = "graphology-compact-1"
+
+# Whitespace between JSON tokens, see JsonStream
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def to_json_value(value):
+    """
+    Convert a value that the JSON encoder doesn't support natively.
+    NumPy scalars and arrays become their Python equivalents, sets become lists,
+    graphs are skipped and anything else is written as its string representation.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, nx.Graph):
+        return None
+    return str(value)
+
+
+def with_defaults(attrs, defaults):
+    """
+    Return attrs with the missing placeholder attributes appended. attrs is copied only if needed.
+    """
+    missing = {k: v for k, v in defaults.items() if k not in attrs}
+    return {**attrs, **missing} if missing else attrs
+
+
+def resolve_backend(backend):
+    """
+    Check a JSON backend name: "json" (the standard library, same output as json.dump), "orjson"
+    (faster, compact output, requires the orjson package) or "auto" (orjson if it is installed).
+    """
+    if backend == "auto":
+        return "orjson" if orjson is not None else "json"
+    if backend not in ("json", "orjson"):
+        raise ValueError(f"Unknown JSON backend '{backend}', use 'json', 'orjson' or 'auto'")
+    if backend == "orjson" and orjson is None:
+        raise ImportError("The 'orjson' backend requires the orjson package")
+    return backend
+
+
+def get_encoder(backend="json", ensure_ascii=True):
+    """
+    Return a function that encodes one JSON value into a string, see resolve_backend().
+    ensure_ascii=False writes non-ASCII characters unescaped, as orjson always does.
+    """
+    if resolve_backend(backend) == "orjson":
+        return lambda value: orjson.dumps(value, default=to_json_value, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf8")
+    return json.JSONEncoder(default=to_json_value, ensure_ascii=ensure_ascii).encode
+
+
+def iter_graphology_chunks(G, backend="json"):
+    """
+    Encode a NetworkX graph in the Graphology JSON format piece by piece.
+    With the "json" backend the concatenated chunks equal json.dumps(nx_to_graphology(G)).
+
+    Yields:
+    - JSON text chunks, one per node and edge.
+    """
+    backend = resolve_backend(backend)
+    encode = get_encoder(backend)
+    # Match the separators of json.dump, orjson output is compact
+    separator, key_separator = (", ", ": ") if backend == "json" else (",", ":")
+
+    yield "{" + encode("nodes") + key_separator + "["
+    for i, (node_id, attrs) in enumerate(G.nodes(data=True)):
+        node = {"key": str(node_id), "attributes": with_defaults(attrs, NODE_DEFAULTS)}
+        yield (separator if i else "") + encode(node)
+
+    yield "]" + separator + encode("edges") + key_separator + "["
+    for i, (u, v, attrs) in enumerate(G.edges(data=True)):
+        edge = {"source": str(u), "target": str(v), "key": str(i), "attributes": with_defaults(attrs, EDGE_DEFAULTS)}
+        yield (separator if i else "") + encode(edge)
+    yield "]"
+    # Graph attributes (e.g. the facet tables of summaries.py), imported by Graphology as graph.getAttributes()
+    if G.graph:
+        yield separator + encode("attributes") + key_separator + encode(G.graph)
+    yield "}"
+
+
+def write_graphology(G, path, backend="json"):
+    """
+    Write a NetworkX graph as Graphology JSON without building the whole document in memory.
+
+    Parameters:
+    - G: NetworkX Graph object.
+    - path: Output path.
+    - backend: JSON backend, see get_encoder().
+    """
+    with open(path, "w", encoding="utf8", buffering=1 << 20) as f:
+        for chunk in iter_graphology_chunks(G, backend):
+            f.write(chunk)
+
+
+def compact_graphology(G):
+    """
+    Convert a NetworkX graph to the compact Graphology format. Titles, languages and genres are
+    stored once in a string table and works once in a work table; edges refer to them by index.
+
+    The compact document has the keys:
+    - 'format': COMPACT_FORMAT.
+    - 'strings': Interned strings (titles, language codes and genres).
+    - 'works': [title, year, language] entries, with titles and languages as string indices.
+    - 'nodes': Nodes as in nx_to_graphology().
+    - 'edges': Edges without 'key'. Their 'works' and 'genres' are lists of work and string indices,
+      'languages' is a list of [language, count] pairs in order of first occurrence.
+
+    Parameters:
+    - G: NetworkX Graph object.
+
+    Returns:
+    - compact_data: The compact document, see expand_compact_graphology() for the reverse.
+    """
+    strings, string_ids = [], {}
+    works, work_ids = [], {}
+
+    def intern(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    def intern_work(title, year, language):
+        work = (intern(title), year, intern(language))
+        if work not in work_ids:
+            work_ids[work] = len(works)
+            works.append(list(work))
+        return work_ids[work]
+
+    nodes = [
+        {"key": str(node_id), "attributes": with_defaults(attrs, NODE_DEFAULTS)}
+        for node_id, attrs in G.nodes(data=True)
+    ]
+
+    edges = []
+    for u, v, attrs in G.edges(data=True):
+        attrs = dict(with_defaults(attrs, EDGE_DEFAULTS))
+        if "works" in attrs and "languages" in attrs:
+            work_languages = zip(attrs["works"], attrs["languages"])
+            attrs["works"] = [intern_work(title, year, language) for (title, year), language in work_languages]
+            attrs["languages"] = [[intern(language), count] for language, count in Counter(attrs["languages"]).items()]
+        if "genres" in attrs:
+            attrs["genres"] = [intern(genre) for genre in attrs["genres"]]
+        edges.append({"source": str(u), "target": str(v), "attributes": attrs})
+
+    compact_data = {"format": COMPACT_FORMAT, "strings": strings, "works": works, "nodes": nodes, "edges": edges}
+    if G.graph:
+        compact_data["attributes"] = G.graph
+    return compact_data
+
+
+def expand_compact_graphology(compact_data):
+    """
+    Expand a compact document from compact_graphology() into the regular Graphology format.
+
+    Returns:
+    - graph_data: A dictionary containing 'nodes' and 'edges', as returned by nx_to_graphology().
+    """
+    strings = compact_data["strings"]
+    works = [(strings[title], year, strings[language]) for title, year, language in compact_data["works"]]
+
+    edges = []
+    for i, edge in enumerate(compact_data["edges"]):
+        attrs = dict(edge["attributes"])
+        if "works" in attrs and "languages" in attrs:
+            edge_works = [works[work_id] for work_id in attrs["works"]]
+            attrs["works"] = [[title, year] for title, year, _ in edge_works]
+            attrs["languages"] = [language for _, _, language in edge_works]
+        if "genres" in attrs:
+            attrs["genres"] = [strings[genre] for genre in attrs["genres"]]
+        edges.append({"source": edge["source"], "target": edge["target"], "key": str(i), "attributes": attrs})
+
+    graph_data = {"nodes": compact_data["nodes"], "edges": edges}
+    if "attributes" in compact_data:
+        graph_data["attributes"] = compact_data["attributes"]
+    return graph_data
+
+
+def write_compact_graphology(G, path, backend="json"):
+    """
+    Write a NetworkX graph in the compact Graphology format, see compact_graphology().
+    """
+    encode = get_encoder(backend)
+    with open(path, "w", encoding="utf8") as f:
+        f.write(encode(compact_graphology(G)))
+
+
+def read_graphology(path):
+    """
+    Read a Graphology JSON file. Compact documents are expanded into the regular format.
+    """
+    with open(path, "r", encoding="utf8") as f:
+        graph_data = json.load(f)
+    if graph_data.get("format") == COMPACT_FORMAT:
+        return expand_compact_graphology(graph_data)
+    return graph_data
+
+
+class JsonStream:
+    """
+    Incremental reader of a JSON text: values are decoded one at a time from a buffered file,
+    so a large document can be walked without loading it whole.
+    """
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Read the next chunk into the buffer, dropping the consumed text. Returns False at the end of the file.
+        """
+        chunk = self.f.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character, or "" at the end of the file.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def skip(self, char):
+        """
+        Consume char if it is the next character.
+        """
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        """
+        Decode the next JSON value. The buffer is extended until the value is complete; a value that
+        ends exactly at the end of the buffer may be a truncated number, so that is retried too.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_graphology(path, stream_keys=("nodes", "edges"), chunk_size=1 << 20):
+    """
+    Read a Graphology JSON file incrementally, keeping only one node or edge in memory at a time.
+
+    Parameters:
+    - path: Path of a Graphology JSON file (not a compact document).
+    - stream_keys: Top-level keys whose arrays are streamed item by item.
+    - chunk_size: Number of characters read at a time.
+
+    Yields:
+    - (key, value) for every top-level key in document order. For the stream_keys, value is a lazy
+      iterator over the array items that must be consumed before the next key (like itertools.groupby),
+      other values are decoded whole.
+    """
+    with open(path, "r", encoding="utf8") as f:
+        stream = JsonStream(f, chunk_size)
+        stream.expect("{")
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key in stream_keys:
+                items = iter_array(stream)
+                yield key, items
+                # Skip the items the caller didn't consume
+                for _ in items:
+                    pass
+            else:
+                yield key, stream.value()
+            stream.skip(",")
+        stream.expect("}")
+
+
+def iter_array(stream):
+    stream.expect("[")
+    while stream.peek() != "]":
+        yield stream.value()
+        stream.skip(",")
+    stream.expect("]")
+
+
+class GraphologyWriter:
+    """
+    Write a JSON document key by key and array item by item, e.g. a Graphology document whose
+    nodes and edges are produced one at a time. Use as a context manager:
+
+        with GraphologyWriter(path) as writer:
+            writer.begin("nodes")
+            for node in nodes:
+                writer.item(node)
+            writer.end()
+            writer.value("attributes", {...})
+
+    With the "json" backend the output equals json.dump(document, f, ensure_ascii=ensure_ascii).
+    """
+
+    def __init__(self, path, backend="json", ensure_ascii=True):
+        self.path = path
+        backend = resolve_backend(backend)
+        self.encode = get_encoder(backend, ensure_ascii)
+        self.separator, self.key_separator = (", ", ": ") if backend == "json" else (",", ":")
+        self.f = None
+        self.n_keys = 0
+        self.n_items = None
+
+    def __enter__(self):
+        self.f = open(self.path, "w", encoding="utf8", buffering=1 << 20)
+        self.f.write("{")
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.n_items is not None:
+            self.end()
+        self.f.write("}")
+        self.f.close()
+
+    def key(self, key):
+        self.f.write((self.separator if self.n_keys else "") + self.encode(key) + self.key_separator)
+        self.n_keys += 1
+
+    def value(self, key, value):
+        """
+        Write a top-level key with its whole value.
+        """
+        self.key(key)
+        self.f.write(self.encode(value))
+
+    def begin(self, key):
+        """
+        Start a top-level key with an array value, filled with item() and closed with end().
+        """
+        self.key(key)
+        self.f.write("[")
+        self.n_items = 0
+
+    def item(self, value):
+        self.f.write((self.separator if self.n_items else "") + self.encode(value))
+        self.n_items += 1
+
+    def end(self):
+        self.f.write("]")
+        self.n_items = None
+
+
+def split_edge(edge, metadata_keys=EDGE_METADATA):
+    """
+    Split one edge into its layout part and its metadata part, see split_graphology().
+    """
+    attrs = edge["attributes"]
+    layout_edge = {**edge, "attributes": {k: v for k, v in attrs.items() if k not in metadata_keys}}
+    return layout_edge, {"key": edge["key"], "attributes": {k: attrs[k] for k in metadata_keys if k in attrs}}
+
+
+def split_graphology(graph_data, metadata_keys=EDGE_METADATA):
+    """
+    Split a Graphology document into a layout part and a metadata part, so that a viewer can
+    render the layout first and fetch the heavy edge metadata later.
+
+    Parameters:
+    - graph_data: A dictionary containing 'nodes' and 'edges'.
+    - metadata_keys: Edge attributes that are moved to the metadata part.
+
+    Returns:
+    - layout_data: The document without the metadata edge attributes.
+    - metadata: A dictionary with 'edges', a list of {'key', 'attributes'} entries in the edge order of layout_data.
+    """
+    layout_edges, metadata_edges = [], []
+    for edge in graph_data["edges"]:
+        layout_edge, metadata_edge = split_edge(edge, metadata_keys)
+        layout_edges.append(layout_edge)
+        metadata_edges.append(metadata_edge)
+
+    layout_data = {**graph_data, "edges": layout_edges}
+    return layout_data, {"edges": metadata_edges}
+
+
+def join_graphology(layout_data, metadata):
+    """
+    Merge the parts from split_graphology() back into one Graphology document.
+    """
+    metadata_by_key = {edge["key"]: edge["attributes"] for edge in metadata["edges"]}
+    edges = [
+        {**edge, "attributes": {**edge["attributes"], **metadata_by_key.get(edge["key"], {})}}
+        for edge in layout_data["edges"]
+    ]
+    return {**layout_data, "edges": edges}
+
+
+def compress_file(path, formats=("gz",)):
+    """
+    Write precompressed copies of a file next to it, e.g. data.json.gz and data.json.br,
+    for static servers that serve them with the matching Content-Encoding.
+
+    Parameters:
+    - path: The file to compress.
+    - formats: Any of "gz" and "br". Brotli requires the brotli package.
+
+    Returns:
+    - paths: The paths of the compressed files.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+
+    paths = []
+    for compression in formats:
+        if compression == "gz":
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        elif compression == "br":
+            if brotli is None:
+                raise ImportError("Brotli compression requires the brotli package")
+            compressed = brotli.compress(content, quality=11)
+        else:
+            raise ValueError(f"Unknown compression '{compression}', use 'gz' or 'br'")
+        with open(f"{path}.{compression}", "wb") as f:
+            f.write(compressed)
+        paths.append(f"{path}.{compression}")
+    return paths
@@ -0,0 +1,252 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import graph_base
+import instrumentation
+
+# Words of a name, without punctuation
+NAME_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+# Longest plausible lifespan in years, merged dates spanning more than this belong to different people
+MAX_LIFESPAN = 110
+
+
+def fold(text):
+    """
+    Lowercase a name and strip its diacritics, e.g. 'Pärn' → 'parn'.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def name_tokens(name):
+    """
+    Split a person name into normalized surname and given name tokens, e.g. 'Tamm, Jaan' → (('tamm',), ('jaan',)).
+    Names without a comma are taken as 'Given Names Surname'.
+    """
+    folded = fold(name)
+    if "," in folded:
+        surname, given = folded.split(",", 1)
+    else:
+        parts = folded.rsplit(None, 1)
+        surname, given = parts[-1], parts[0] if len(parts) > 1 else ""
+    return tuple(NAME_TOKEN_PATTERN.findall(surname)), tuple(NAME_TOKEN_PATTERN.findall(given))
+
+
+def block_key(surname, given):
+    """
+    Return the blocking key of a name: its surname tokens and the initials of its given names, e.g. ('tamm', 'jp')
+    for 'Tamm, Jaan Peeter' and 'Tamm, J. P.'. Only names with the same key are compared; names with different
+    keys can't be compatible, see names_compatible().
+    """
+    return " ".join(surname), "".join(token[0] for token in given)
+
+
+def names_compatible(given, other):
+    """
+    Check whether two lists of given name tokens can name the same person: they have the same length and
+    every pair of tokens is equal or an initial of the other ('j' and 'jaan').
+    """
+    if len(given) != len(other):
+        return False
+    for token, other_token in zip(given, other):
+        if token != other_token and not (min(len(token), len(other_token)) == 1 and token[0] == other_token[0]):
+            return False
+    return True
+
+
+def dates_compatible(dates, other):
+    """
+    Check whether two (date_of_birth, date_of_death) pairs can belong to the same person: each date is equal or
+    unknown in one of them, and the merged dates form a plausible life, with the birth not after the death and
+    at most MAX_LIFESPAN years between them.
+
+    >>> dates_compatible((None, 1910), (1850, None))
+    True
+    >>> dates_compatible((None, 1850), (1900, None))
+    False
+    >>> dates_compatible((1700, None), (None, 1850))
+    False
+    """
+    for date, other_date in zip(dates, other):
+        if date is not None and other_date is not None and date != other_date:
+            return False
+    birth = dates[0] if dates[0] is not None else other[0]
+    death = dates[1] if dates[1] is not None else other[1]
+    return birth is None or death is None or 0 <= death - birth <= MAX_LIFESPAN
+
+
+def specificity(variant):
+    """
+    Sort key of the variants of a block: known dates first, then full given names, then the most frequent.
+    """
+    known_dates = (variant["date_of_birth"] is not None) + (variant["date_of_death"] is not None)
+    full_names = sum(len(token) > 1 for token in variant["given"])
+    return -known_dates, -full_names, -variant["count"], variant["person"]
+
+
+def resolve_block(variants):
+    """
+    Cluster the variants of one block, from the most to the least specific (see specificity()).
+    Every variant joins the single cluster whose merged name and dates it is compatible with (see
+    dates_compatible()), or starts a new cluster. A variant compatible with several clusters is ambiguous and
+    stays a cluster of its own that no other variant joins.
+
+    Parameters:
+    - variants: A list of dicts with the keys 'person', 'name', 'given', 'date_of_birth', 'date_of_death' and 'count'.
+
+    Returns:
+    - clusters: A list of clusters, dicts with the keys 'members' (person identifiers, the most specific first),
+      'name' (the name of the first member), 'given', 'date_of_birth', 'date_of_death' and 'open'.
+
+    A death date only and a later birth date only can't be merged into one life:
+
+    >>> variants = [
+    ...     {"person": "Saar, Mari (-1850)", "name": "Saar, Mari", "given": ("mari",), "date_of_birth": None, "date_of_death": 1850, "count": 1},
+    ...     {"person": "Saar, Mari (1900-)", "name": "Saar, Mari", "given": ("mari",), "date_of_birth": 1900, "date_of_death": None, "count": 1},
+    ... ]
+    >>> [cluster["members"] for cluster in resolve_block(variants)]
+    [['Saar, Mari (-1850)'], ['Saar, Mari (1900-)']]
+    """
+    clusters = []
+    for variant in sorted(variants, key=specificity):
+        matches = [
+            cluster for cluster in clusters
+            if cluster["open"]
+            and names_compatible(cluster["given"], variant["given"])
+            and dates_compatible((cluster["date_of_birth"], cluster["date_of_death"]), (variant["date_of_birth"], variant["date_of_death"]))
+        ]
+        instrumentation.count("identity_comparisons", len(clusters))
+        if len(matches) == 1:
+            cluster = matches[0]
+            cluster["members"].append(variant["person"])
+            cluster["given"] = tuple(max(tokens, key=len) for tokens in zip(cluster["given"], variant["given"]))
+            if cluster["date_of_birth"] is None:
+                cluster["date_of_birth"] = variant["date_of_birth"]
+            if cluster["date_of_death"] is None:
+                cluster["date_of_death"] = variant["date_of_death"]
+        else:
+            if matches:
+                instrumentation.count("identity_ambiguous", 1)
+            clusters.append({
+                "members": [variant["person"]],
+                "name": variant["name"],
+                "given": variant["given"],
+                "date_of_birth": variant["date_of_birth"],
+                "date_of_death": variant["date_of_death"],
+                "open": not matches,
+            })
+    return clusters
+
+
+def build_identities(persons):
+    """
+    Resolve the person identifiers of a person table to canonical identities, so that e.g.
+    'Name (1850-1910)', 'Name (1850-)' and 'Name' become one node. Identifiers are grouped into blocks
+    by block_key() and only compared within their block, see resolve_block().
+
+    Parameters:
+    - persons: A person table, see graph_base.person_table().
+
+    Returns:
+    - identities: pd.DataFrame indexed by 'person' (every identifier of persons with a parsed name) with the
+      columns 'canonical' (the identifier of the merged identity, from the name of its most specific variant and
+      the merged dates), 'date_of_birth' and 'date_of_death' (the merged dates).
+    """
+    variants = persons[persons["name"].notna()].groupby("person", sort=False).agg(
+        name=("name", "first"),
+        date_of_birth=("date_of_birth", "first"),
+        date_of_death=("date_of_death", "first"),
+        count=("record", "size"),
+    ).reset_index()
+    tokens = [name_tokens(name) for name in variants["name"].tolist()]
+    variants["given"] = [given for _, given in tokens]
+    variants["block"] = [block_key(surname, given) for surname, given in tokens]
+
+    persons_out, canonical, births, deaths = [], [], [], []
+    blocks = variants.groupby("block", sort=False).indices
+    instrumentation.count("identity_blocks", len(blocks))
+    records = variants.astype(object).where(variants.notna(), None).to_dict("records")
+    for block, positions in blocks.items():
+        if len(positions) == 1:
+            record = records[positions[0]]
+            clusters = [{"members": [record["person"]], "name": record["name"], "date_of_birth": record["date_of_birth"], "date_of_death": record["date_of_death"]}]
+        else:
+            clusters = resolve_block([records[position] for position in positions])
+        for cluster in clusters:
+            if len(cluster["members"]) == 1:
+                identifier = cluster["members"][0]
+            else:
+                identifier = graph_base.get_node_identifier(cluster["name"], cluster["date_of_birth"], cluster["date_of_death"])
+                instrumentation.count("persons_merged", len(cluster["members"]) - 1)
+            persons_out.extend(cluster["members"])
+            canonical.extend([identifier] * len(cluster["members"]))
+            births.extend([cluster["date_of_birth"]] * len(cluster["members"]))
+            deaths.extend([cluster["date_of_death"]] * len(cluster["members"]))
+
+    return pd.DataFrame({
+        "canonical": np.array(canonical, dtype=object),
+        "date_of_birth": np.array(births, dtype=object),
+        "date_of_death": np.array(deaths, dtype=object),
+    }, index=pd.Index(persons_out, name="person", dtype=object))
+
+
+def lookup(identities, persons, column, default):
+    """
+    Look up a column of identities for an array of person identifiers, taking default where an identifier is missing.
+    """
+    positions = identities.index.get_indexer(persons)
+    found = positions >= 0
+    values = np.array(default, dtype=object)
+    values[found] = identities[column].to_numpy()[positions[found]]
+    return values
+
+
+def apply_identities(tables, identities):
+    """
+    Replace the person identifiers of parsed tables with their canonical identities.
+
+    Parameters:
+    - tables: The (df, persons, pairs) tuple from create_graph.collect_tables().
+    - identities: The canonical identities, see build_identities().
+
+    Returns:
+    - tables: A new (df, persons, pairs) tuple. Persons get the canonical identifier and merged dates,
+      pairs the canonical translator and author. Identifiers missing from identities are kept.
+      Variants of one identity in the same record are counted once: duplicate (record, person, role) rows of
+      persons and (record, translator, author) rows of pairs are dropped, keeping the first position.
+
+    >>> persons = pd.DataFrame({
+    ...     "record": [0, 0, 0], "position": [0, 1, 2], "column": ["creator", "creator", "contributor"],
+    ...     "person": ["Tamm, J.", "Tamm, Jaan", "Saar, Mari"], "name": ["Tamm, J.", "Tamm, Jaan", "Saar, Mari"],
+    ...     "date_of_birth": [None] * 3, "date_of_death": [None] * 3, "role": ["autor", "autor", "tõlkija"],
+    ... })
+    >>> pairs = pd.DataFrame({
+    ...     "record": [0, 0], "translator": ["Saar, Mari"] * 2, "author": ["Tamm, J.", "Tamm, Jaan"],
+    ...     "year": [1990] * 2, "title": ["Meri"] * 2, "language": ["eng"] * 2,
+    ... })
+    >>> _, persons, pairs = apply_identities((None, persons, pairs), build_identities(persons))
+    >>> persons[["record", "position", "person", "role"]].values.tolist()
+    [[0, 0, 'Tamm, Jaan', 'autor'], [0, 2, 'Saar, Mari', 'tõlkija']]
+    >>> pairs[["record", "translator", "author"]].values.tolist()
+    [[0, 'Saar, Mari', 'Tamm, Jaan']]
+    """
+    df, persons, pairs = tables
+    person_ids = persons["person"].to_numpy(dtype=object)
+    persons = persons.assign(
+        person=lookup(identities, person_ids, "canonical", person_ids),
+        date_of_birth=lookup(identities, person_ids, "date_of_birth", persons["date_of_birth"].to_numpy(dtype=object)),
+        date_of_death=lookup(identities, person_ids, "date_of_death", persons["date_of_death"].to_numpy(dtype=object)),
+    )
+    translators = pairs["translator"].to_numpy(dtype=object)
+    authors = pairs["author"].to_numpy(dtype=object)
+    pairs = pairs.assign(
+        translator=lookup(identities, translators, "canonical", translators),
+        author=lookup(identities, authors, "canonical", authors),
+    )
+    # Both tables are ordered by record and position, so the first duplicate has the lowest position
+    persons = persons.drop_duplicates(["record", "person", "role"]).reset_index(drop=True)
+    pairs = pairs.drop_duplicates(["record", "translator", "author"]).reset_index(drop=True)
+    return df, persons, pairs
@@ -0,0 +1,353 @@
+import pandas as pd
+import networkx as nx
+import pickle
+import os
+import sys
+from collections import Counter
+from create_graph import (
+    export_graph, filter_records, finalize_graph, pair_table, person_table, process_genres
+)
+from erb_loader import ERB_PATH, GRAPH_COLUMNS, RECORD_ID_COLUMN, load_erb
+
+# Columns that contribute to the graph. A record is re-applied when any of them changes.
+RECORD_COLUMNS = ["creator", "contributor", "title", "publication_date_cleaned", "language_original", "genre_keyword"]
+
+
+def empty_state(min_year, max_year):
+    """
+    Create an empty graph state for the given publication year range.
+
+    The state holds the per-record contributions and the accumulators built from them:
+    - 'hashes': record id → hash of the record's RECORD_COLUMNS.
+    - 'records': record id → contribution (pairs, people, creators, year, title, language, genres).
+    - 'edges': (translator, author) → {record id: number of pairs of that record}.
+    - 'nodes': person → label, dates, role counts and a Counter of active years.
+    - 'languages': person → Counter of the original languages of the records they created.
+    - 'order': record id → position in the latest export, used to order the nodes, edges and works like a full build.
+    """
+    return {
+        "min_year": min_year,
+        "max_year": max_year,
+        "hashes": {},
+        "records": {},
+        "edges": {},
+        "nodes": {},
+        "languages": {},
+        "order": {},
+    }
+
+
+def hash_records(df):
+    """
+    Hash the graph-relevant columns of every record.
+
+    Returns:
+    - hashes: pd.Series of uint64 hashes indexed like df.
+    """
+    return pd.util.hash_pandas_object(df[RECORD_COLUMNS], index=False)
+
+
+def record_contributions(df, min_year, max_year, id_column=None):
+    """
+    Compute the contribution of every record to the graph.
+
+    Parameters:
+    - df: pd.DataFrame containing publication data.
+    - min_year: Minimum publication year.
+    - max_year: Maximum publication year.
+    - id_column: Column with the record identifiers. The index of df is used if None.
+
+    Returns:
+    - contributions: A dict mapping record ids to contributions. Records outside the year range or
+      without creators and contributors map to None.
+    """
+    record_ids = df.index.tolist() if id_column is None else df[id_column].tolist()
+    contributions = dict.fromkeys(record_ids)
+
+    records = filter_records(df.assign(record_id=record_ids), min_year, max_year)
+    persons = person_table(records)
+    pairs = pair_table(records, persons)
+    people = persons[persons["role"].isin(["autor", "tõlkija"])]
+    people = people.assign(role_order=(people["role"] == "tõlkija").astype(int))
+    people = people.sort_values(["record", "role_order", "position"], kind="stable")
+    creators = persons.loc[persons["column"] == "creator", ["record", "person"]].drop_duplicates()
+
+    pairs_by_record = pairs.groupby("record", sort=False)[["translator", "author"]]
+    pairs_by_record = {record: list(group.itertuples(index=False, name=None)) for record, group in pairs_by_record}
+    people_by_record = people.groupby("record", sort=False)[["person", "role", "date_of_birth", "date_of_death"]]
+    people_by_record = {record: list(group.itertuples(index=False, name=None)) for record, group in people_by_record}
+    creators_by_record = creators.groupby("record", sort=False)["person"]
+    creators_by_record = {record: group.tolist() for record, group in creators_by_record}
+
+    columns = zip(
+        records["record_id"].tolist(),
+        records["publication_date_cleaned"].tolist(),
+        records["title"].tolist(),
+        records["language_original"].tolist(),
+        records["genre_keyword"].tolist(),
+    )
+    for record, (record_id, year, title, language, genre_str) in enumerate(columns):
+        pairs_list = pairs_by_record.get(record, [])
+        contributions[record_id] = {
+            "pairs": pairs_list,
+            # Role counts and activity years only come from records that produce edges
+            "people": people_by_record.get(record, []) if pairs_list else [],
+            "creators": creators_by_record.get(record, []) if pd.notna(language) else [],
+            "year": year,
+            "title": title,
+            "language": language,
+            "genres": set(process_genres(genre_str)),
+        }
+    return contributions
+
+
+def add_record(state, record_id, contribution):
+    """
+    Add the contribution of a record to the accumulators of the state.
+    """
+    state["records"][record_id] = contribution
+    if contribution is None:
+        return
+
+    year = contribution["year"]
+    for person, role, birth_date, death_date in contribution["people"]:
+        node = state["nodes"].setdefault(person, {
+            "label": person,
+            "date_of_birth": birth_date or 0,
+            "date_of_death": death_date or 0,
+            "autor_count": 0,
+            "tõlkija_count": 0,
+            "years": Counter(),
+        })
+        node[f"{role}_count"] += 1
+        node["years"][year] += 1
+
+    for pair in contribution["pairs"]:
+        edge = state["edges"].setdefault(pair, {})
+        edge[record_id] = edge.get(record_id, 0) + 1
+
+    for person in contribution["creators"]:
+        state["languages"].setdefault(person, Counter())[contribution["language"]] += 1
+
+
+def remove_record(state, record_id):
+    """
+    Subtract the contribution of a record from the accumulators of the state.
+    Nodes, edges and language counters that are left empty are dropped.
+    """
+    state["hashes"].pop(record_id, None)
+    contribution = state["records"].pop(record_id, None)
+    if contribution is None:
+        return
+
+    year = contribution["year"]
+    for person, role, _, _ in contribution["people"]:
+        node = state["nodes"][person]
+        node[f"{role}_count"] -= 1
+        node["years"][year] -= 1
+        if node["years"][year] == 0:
+            del node["years"][year]
+        if not node["years"]:
+            del state["nodes"][person]
+
+    for pair in set(contribution["pairs"]):
+        edge = state["edges"][pair]
+        del edge[record_id]
+        if not edge:
+            del state["edges"][pair]
+
+    for person in contribution["creators"]:
+        languages = state["languages"][person]
+        languages[contribution["language"]] -= 1
+        if languages[contribution["language"]] == 0:
+            del languages[contribution["language"]]
+        if not languages:
+            del state["languages"][person]
+
+
+def apply_records(state, df, removed_ids=(), id_column=None):
+    """
+    Apply a delta to the state: remove the records in removed_ids and (re-)add the records in df.
+    Records in df that are already in the state replace their previous version.
+
+    Parameters:
+    - state: The graph state, see empty_state().
+    - df: pd.DataFrame with the added and changed records.
+    - removed_ids: Identifiers of the removed records.
+    - id_column: Column with the record identifiers. The index of df is used if None.
+
+    Returns:
+    - state: The updated state.
+    """
+    for record_id in removed_ids:
+        remove_record(state, record_id)
+
+    contributions = record_contributions(df, state["min_year"], state["max_year"], id_column)
+    hashes = hash_records(df).tolist()
+    for (record_id, contribution), record_hash in zip(contributions.items(), hashes):
+        remove_record(state, record_id)
+        add_record(state, record_id, contribution)
+        state["hashes"][record_id] = record_hash
+    return state
+
+
+def diff_records(state, erb, id_column=None):
+    """
+    Compare a full export with the state.
+
+    Returns:
+    - changed: pd.DataFrame with the records of erb that were added or changed.
+    - removed_ids: A list of identifiers that are in the state but not in erb.
+    """
+    record_ids = erb.index if id_column is None else pd.Index(erb[id_column])
+    hashes = hash_records(erb).to_numpy()
+    previous = pd.Series(list(state["hashes"].values()), index=list(state["hashes"].keys()), dtype="uint64")
+    known = record_ids.isin(previous.index)
+    changed = ~known
+    changed[known] = previous.reindex(record_ids[known]).to_numpy() != hashes[known]
+    removed_ids = list(set(state["hashes"]).difference(record_ids))
+    return erb[changed], removed_ids
+
+
+def state_to_graph(state, id_to_int=False):
+    """
+    Build the finished graph from the accumulators of the state.
+
+    Parameters:
+    - state: The graph state, see empty_state().
+    - id_to_int: Replace node IDs with integers.
+
+    Returns:
+    - G: A NetworkX DiGraph with the same attributes as the graph from create_graph().
+    """
+    records = state["records"]
+    order = state["order"]
+    # Nodes in the order they are first touched by an edge and edges in the order they are first created,
+    # going through the records in export order like graph_columns(), so that id_to_int gives the same keys
+    node_order, edge_order, first_roles = {}, {}, {}
+    for record_id in sorted(records, key=lambda record_id: order.get(record_id, -1)):
+        contribution = records[record_id]
+        if contribution is None:
+            continue
+        for translator, author in contribution["pairs"]:
+            edge_order.setdefault((translator, author))
+            node_order.setdefault(translator)
+            node_order.setdefault(author)
+        for person, role, _, _ in contribution["people"]:
+            first_roles.setdefault(person, role)
+
+    G = nx.DiGraph()
+    for person in node_order:
+        node = state["nodes"][person]
+        attrs = {
+            "label": node["label"],
+            "date_of_birth": node["date_of_birth"],
+            "date_of_death": node["date_of_death"],
+        }
+        # Same key order as build_graph_columnar(): the first seen role comes first
+        first_role = first_roles[person]
+        other_role = "tõlkija" if first_role == "autor" else "autor"
+        attrs[f"{first_role}_count"] = node[f"{first_role}_count"]
+        attrs["activity_start"] = min(node["years"])
+        attrs["activity_end"] = max(node["years"])
+        if node[f"{other_role}_count"]:
+            attrs[f"{other_role}_count"] = node[f"{other_role}_count"]
+        G.add_node(person, **attrs)
+
+    for node_u, node_v in edge_order:
+        contributors = state["edges"][(node_u, node_v)]
+        # Works are listed in export order, like in a full build
+        record_ids = sorted(contributors, key=lambda record_id: order.get(record_id, -1))
+        contributions = [records[record_id] for record_id in record_ids for _ in range(contributors[record_id])]
+        years = [contribution["year"] for contribution in contributions]
+        genres = set()
+        for contribution in contributions:
+            genres.update(contribution["genres"])
+        G.add_edge(
+            node_u, node_v,
+            weight=len(contributions),
+            works=[(contribution["title"], contribution["year"]) for contribution in contributions],
+            languages=[contribution["language"] for contribution in contributions],
+            genres=genres,
+            activity_start=min(years),
+            activity_end=max(years)
+        )
+
+    return finalize_graph(G, state["languages"], id_to_int)
+
+
+def load_state(path):
+    """
+    Load a pickled graph state.
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_state(state, path):
+    """
+    Pickle the graph state to path.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def update_graph(erb, state_path, min_year, max_year, id_column=RECORD_ID_COLUMN, id_to_int=False):
+    """
+    Update the persisted graph state from a full export and return the updated graph.
+    Only the added, removed and changed records are parsed and applied. A new state is
+    created if state_path doesn't exist or was built for a different year range.
+
+    Parameters:
+    - erb: pd.DataFrame containing publication data (the complete current export).
+    - state_path: Path of the pickled state.
+    - min_year: Minimum publication year.
+    - max_year: Maximum publication year.
+    - id_column: Column with the stable record identifiers of the export (default: erb_loader.RECORD_ID_COLUMN).
+      Row positions aren't stable between exports, so a column is required: with positions, inserting one record
+      would change the ids of all later records and the update would re-apply them all.
+    - id_to_int: Replace node IDs with integers.
+
+    Returns:
+    - G: The updated NetworkX DiGraph.
+    """
+    if id_column is None:
+        raise ValueError("update_graph() needs a column with stable record identifiers, e.g. id_column='id'")
+    if id_column not in erb.columns:
+        raise ValueError(f"The record identifier column '{id_column}' is missing from the export")
+
+    state = load_state(state_path) if os.path.isfile(state_path) else None
+    if state is None or (state["min_year"], state["max_year"]) != (min_year, max_year):
+        state = empty_state(min_year, max_year)
+
+    changed, removed_ids = diff_records(state, erb, id_column)
+    print(f"Applying {len(changed)} added or changed and {len(removed_ids)} removed records")
+    apply_records(state, changed, removed_ids, id_column)
+    record_ids = erb[id_column]
+    state["order"] = dict(zip(record_ids.tolist(), range(len(erb))))
+    save_state(state, state_path)
+
+    return state_to_graph(state, id_to_int)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        key = sys.argv[1]
+        min_year = int(sys.argv[2])
+        max_year = int(sys.argv[3])
+    else:
+        key = "data"
+        min_year = 1800
+        max_year = 2025
+        print("Updating graph from timerange 1800 to 2025. Use 'python incremental_graph.py <key> <min_year> <max_year>' to change the default values")
+
+    print("Loading data")
+    df = load_erb(ERB_PATH, min_year, max_year, columns=[RECORD_ID_COLUMN] + GRAPH_COLUMNS)
+
+    print("Updating graph")
+    G = update_graph(df, f"../data/state/{key}.pickle", min_year, max_year, id_column=RECORD_ID_COLUMN, id_to_int=True)
+
+    export_graph(G, key)
+
+    print(f"Done! Check ../data/{key}.json and ../data/gephi/{key}_for_gephi.gexf")
@@ -0,0 +1,158 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The report of the running pipeline, see run(). Stages and counters are ignored while it is None.
+active_report = None
+
+# Callbacks called as hook(event, payload), see add_hook()
+hooks = []
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of the process in MiB, or None where the resource module is missing (Windows).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def add_hook(hook):
+    """
+    Register a callback for instrumentation events, e.g. to forward them to monitoring.
+    The hook is called as hook(event, payload) with the events:
+    - "stage_start": payload {'name'}.
+    - "stage_end": the stage record {'name', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb'}.
+    - "run_end": the complete report, see RunReport.to_dict().
+    """
+    hooks.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Unregister a callback added with add_hook().
+    """
+    hooks.remove(hook)
+
+
+def emit(event, payload):
+    for hook in list(hooks):
+        hook(event, payload)
+
+
+class RunReport:
+    """
+    Timings of the stages and counters of one pipeline run.
+    """
+
+    def __init__(self, name, **metadata):
+        self.name = name
+        self.metadata = metadata
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.stages = []
+        self.counters = {}
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.wall_seconds = None
+        self.cpu_seconds = None
+
+    def count(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + int(value)
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.wall_start
+        self.cpu_seconds = time.process_time() - self.cpu_start
+
+    def to_dict(self):
+        """
+        Return the report as a JSON-serializable dict with 'name', 'metadata', 'started_at', total
+        'wall_seconds', 'cpu_seconds' and 'peak_rss_mb', the list of 'stages' in execution order and 'counters'.
+        """
+        return {
+            "name": self.name,
+            "metadata": self.metadata,
+            "started_at": self.started_at,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+@contextmanager
+def run(name, report_path=None, **metadata):
+    """
+    Instrument a pipeline run: stages and counters inside the block are recorded in a RunReport,
+    which is passed to the "run_end" hooks and written to report_path (if given) at the end.
+
+    Parameters:
+    - name: Name of the run, e.g. the script name.
+    - report_path: Path of the JSON run report (optional).
+    - metadata: Further values stored in the report, e.g. the command line arguments.
+
+    Yields:
+    - report: The RunReport.
+    """
+    global active_report
+    previous, active_report = active_report, RunReport(name, **metadata)
+    report = active_report
+    try:
+        yield report
+    finally:
+        active_report = previous
+        report.finish()
+        emit("run_end", report.to_dict())
+        if report_path is not None:
+            report.write(report_path)
+
+
+@contextmanager
+def stage(name):
+    """
+    Measure the wall time, CPU time and peak RSS of a pipeline stage. Does nothing outside run().
+    CPU time and peak RSS are those of this process, without worker processes. The peak RSS is the
+    high-water mark of the process at the end of the stage.
+    """
+    report = active_report
+    if report is None:
+        yield
+        return
+
+    emit("stage_start", {"name": name})
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        record = {
+            "name": name,
+            "wall_seconds": time.perf_counter() - wall_start,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        report.stages.append(record)
+        emit("stage_end", record)
+
+
+def count(counter, value=1):
+    """
+    Add value to a counter of the running report. Does nothing outside run().
+    """
+    if active_report is not None:
+        active_report.count(counter, value)
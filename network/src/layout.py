@@ -0,0 +1,338 @@
+import numpy as np
+
+# Depth of the Barnes–Hut quadtree, and the number of nodes in the neighborhood of a cell
+# below which they interact directly
+MAX_LEVELS = 20
+NEAR_SIZE = 32
+
+# Cell offsets of the neighborhood of a cell, and of the children of its parent's neighborhood
+# relative to the parent's first child
+NEAR_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]).T
+FAR_OFFSETS = np.array([(dx, dy) for dx in range(-2, 4) for dy in range(-2, 4)]).T
+
+
+def graph_arrays(graphology_data):
+    """
+    Convert the nodes and edges of a Graphology document into arrays.
+
+    Returns:
+    - keys: List of node keys.
+    - sources: Array of source node indices.
+    - targets: Array of target node indices.
+    - weights: Array of edge weights (the 'weight' attribute, 1.0 if missing).
+    """
+    keys = [node["key"] for node in graphology_data["nodes"]]
+    index = {key: i for i, key in enumerate(keys)}
+    edges = graphology_data["edges"]
+    sources = np.array([index[edge["source"]] for edge in edges], dtype=np.int64)
+    targets = np.array([index[edge["target"]] for edge in edges], dtype=np.int64)
+    weights = np.array([edge.get("attributes", {}).get("weight", 1.0) for edge in edges], dtype=np.float64)
+    return keys, sources, targets, weights
+
+
+def node_identity(node):
+    """
+    Identify a Graphology node across releases by its label (the person identifier), or by its key if it has none.
+    """
+    return node.get("attributes", {}).get("label", node["key"])
+
+
+def initial_positions(keys, sources, targets, previous=None, seed=42):
+    """
+    Create the starting positions of the layout.
+    Nodes with a previous position keep it. New nodes are placed next to the mean position of their
+    placed neighbors, or at a random position if they have none.
+
+    Parameters:
+    - keys: List of node identifiers.
+    - sources, targets: Edge endpoints as node indices.
+    - previous: A dict mapping node identifiers to (x, y), e.g. from the previous release (optional).
+    - seed: Seed of the random number generator.
+
+    Returns:
+    - positions: Array of shape (n, 2).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(keys)
+    previous = previous or {}
+    placed = np.array([key in previous for key in keys], dtype=bool)
+    positions = np.zeros((n, 2))
+    if placed.any():
+        positions[placed] = np.array([previous[key] for key, known in zip(keys, placed) if known], dtype=np.float64)
+        spread = positions[placed].std(axis=0).mean() or 1.0
+    else:
+        spread = np.sqrt(n) * 10.0
+
+    # Place new nodes next to their placed neighbors
+    new = ~placed
+    if placed.any() and new.any():
+        ends = np.concatenate([sources, targets])
+        others = np.concatenate([targets, sources])
+        known = placed[others] & new[ends]
+        counts = np.bincount(ends[known], minlength=n)
+        sums = np.column_stack([np.bincount(ends[known], weights=positions[others[known], axis], minlength=n) for axis in range(2)])
+        has_neighbors = new & (counts > 0)
+        positions[has_neighbors] = sums[has_neighbors] / counts[has_neighbors, None]
+        positions[has_neighbors] += rng.normal(scale=spread * 0.01, size=(has_neighbors.sum(), 2))
+        new &= counts == 0
+
+    center = positions[placed].mean(axis=0) if placed.any() else np.zeros(2)
+    positions[new] = center + rng.uniform(-spread, spread, size=(new.sum(), 2))
+    return positions
+
+
+def expand_ranges(starts, counts):
+    """
+    Concatenate the ranges [start, start + count) into one index array.
+    """
+    total = counts.sum()
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def barnes_hut_repulsion(positions, mass, scaling_ratio):
+    """
+    Compute the ForceAtlas2 repulsion with a Barnes–Hut approximation on an adaptive quadtree.
+
+    Going down the levels, a node interacts with the centers of mass of the cells that are children of
+    its parent's neighbors but not neighbors of its own cell. Once the neighborhood of its cell holds at
+    most NEAR_SIZE nodes, it interacts with them directly and stops descending. Every pair of nodes is thus
+    counted once, and far-away cells are at least one cell apart, which bounds the error like a
+    Barnes–Hut opening angle of about 1.
+
+    Parameters:
+    - positions: Array of shape (n, 2).
+    - mass: Array of node masses (degree + 1).
+    - scaling_ratio: Repulsion strength.
+
+    Returns:
+    - forces: Array of shape (n, 2).
+    """
+    n = len(positions)
+    forces = np.zeros((n, 2))
+    if n < 2:
+        return forces
+
+    lower = positions.min(axis=0)
+    extent = (positions.max(axis=0) - lower).max() or 1.0
+    finest = np.minimum((positions - lower) / extent * (1 << MAX_LEVELS), (1 << MAX_LEVELS) - 1).astype(np.int64)
+    active = np.ones(n, dtype=bool)
+
+    for level in range(1, MAX_LEVELS + 1):
+        size = 1 << level
+        cells = finest >> (MAX_LEVELS - level)
+        keys = cells[:, 0] * size + cells[:, 1]
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts, node_cell = np.unique(keys[order], return_index=True, return_inverse=True)
+        node_cell[order] = node_cell.copy()
+        counts = np.diff(np.append(starts, n))
+        cell_mass = np.bincount(node_cell, weights=mass)
+        cell_x = np.bincount(node_cell, weights=mass * positions[:, 0]) / cell_mass
+        cell_y = np.bincount(node_cell, weights=mass * positions[:, 1]) / cell_mass
+
+        # Far field: active nodes × cells in the interaction list of their cell
+        active_cells = np.unique(node_cell[active])
+        cell, other = neighbor_cells(unique_keys, active_cells, size, FAR_OFFSETS, parent=True)
+        cell_counts = np.bincount(cell, minlength=len(unique_keys))
+        cell_starts = np.cumsum(cell_counts) - cell_counts
+        node = np.flatnonzero(active)
+        node_counts = cell_counts[node_cell[node]]
+        target = other[expand_ranges(cell_starts[node_cell[node]], node_counts)]
+        node = np.repeat(node, node_counts)
+        delta = positions[node] - np.column_stack([cell_x[target], cell_y[target]])
+        add_repulsion(forces, node, delta, mass[node] * cell_mass[target], scaling_ratio)
+
+        # Near field: cells with small neighborhoods are finished with direct interactions
+        cell, other = neighbor_cells(unique_keys, active_cells, size, NEAR_OFFSETS)
+        near_counts = np.bincount(cell, weights=counts[other], minlength=len(unique_keys))
+        if level < MAX_LEVELS:
+            finished = near_counts[cell] <= NEAR_SIZE
+            cell, other = cell[finished], other[finished]
+
+        sizes = counts[cell] * counts[other]
+        pair = np.repeat(np.arange(len(cell)), sizes)
+        local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        other_counts = counts[other][pair]
+        node = order[starts[cell][pair] + local // other_counts]
+        other_node = order[starts[other][pair] + local % other_counts]
+        add_repulsion(forces, node, positions[node] - positions[other_node], mass[node] * mass[other_node], scaling_ratio)
+
+        active[node] = False
+        if not active.any():
+            break
+    return forces
+
+
+def neighbor_cells(unique_keys, cells, size, offsets, parent=False):
+    """
+    List the occupied cells at the given offsets from each of the given cells.
+
+    Parameters:
+    - unique_keys: Sorted keys (x * size + y) of the occupied cells of a level.
+    - cells: Indices in unique_keys of the cells to list neighbors for.
+    - size: Number of cells per side on the level.
+    - offsets: Array of shape (2, k) with the x and y offsets.
+    - parent: Offsets are relative to the first child of the cell's parent, and the cell's own
+      neighbors are left out (the interaction list of the Barnes–Hut far field).
+
+    Returns:
+    - cell, other: Indices in unique_keys of the cell and of the listed cell, sorted by cell.
+    """
+    cell_x, cell_y = unique_keys[cells] // size, unique_keys[cells] % size
+    base_x, base_y = ((cell_x >> 1) << 1, (cell_y >> 1) << 1) if parent else (cell_x, cell_y)
+    other_x = (base_x[:, None] + offsets[0][None, :]).ravel()
+    other_y = (base_y[:, None] + offsets[1][None, :]).ravel()
+    index = np.repeat(np.arange(len(cells)), offsets.shape[1])
+    keep = (other_x >= 0) & (other_x < size) & (other_y >= 0) & (other_y < size)
+    if parent:
+        keep &= (np.abs(other_x - cell_x[index]) > 1) | (np.abs(other_y - cell_y[index]) > 1)
+    other_keys = other_x[keep] * size + other_y[keep]
+    other = np.minimum(np.searchsorted(unique_keys, other_keys), len(unique_keys) - 1)
+    found = unique_keys[other] == other_keys
+    return cells[index[keep][found]], other[found]
+
+
+def exact_repulsion(positions, mass, scaling_ratio, chunk_size=2048):
+    """
+    Compute the ForceAtlas2 repulsion between all pairs of nodes, in chunks. Meant for small graphs and for testing.
+    """
+    n = len(positions)
+    forces = np.zeros((n, 2))
+    for start in range(0, n, chunk_size):
+        node = np.repeat(np.arange(start, min(start + chunk_size, n)), n)
+        other_node = np.tile(np.arange(n), min(chunk_size, n - start))
+        distinct = node != other_node
+        node, other_node = node[distinct], other_node[distinct]
+        add_repulsion(forces, node, positions[node] - positions[other_node], mass[node] * mass[other_node], scaling_ratio)
+    return forces
+
+
+def add_repulsion(forces, node, delta, mass_product, scaling_ratio):
+    """
+    Add the repulsion k_r * m_1 * m_2 / d along delta to the forces of the given nodes.
+    Pairs at the same position are skipped.
+    """
+    distance_sq = delta[:, 0] ** 2 + delta[:, 1] ** 2
+    factor = np.divide(scaling_ratio * mass_product, distance_sq, out=np.zeros_like(distance_sq), where=distance_sq > 0)
+    for axis in range(2):
+        forces[:, axis] += np.bincount(node, weights=factor * delta[:, axis], minlength=len(forces))
+
+
+def forceatlas2(positions, sources, targets, weights, iterations=500, scaling_ratio=2.0, gravity=1.0,
+                strong_gravity=False, edge_weight_influence=1.0, jitter_tolerance=1.0, barnes_hut=True,
+                progress=None):
+    """
+    Run the ForceAtlas2 layout (Jacomy et al. 2014) with the adaptive speed of the Gephi implementation.
+    Edges are treated as undirected, the node mass is degree + 1.
+
+    Parameters:
+    - positions: Array of starting positions of shape (n, 2), see initial_positions().
+    - sources, targets, weights: Edge endpoints as node indices and edge weights.
+    - iterations: Number of iterations.
+    - scaling_ratio: Strength of the repulsion.
+    - gravity: Strength of the pull towards the origin.
+    - strong_gravity: Use gravity proportional to the distance from the origin.
+    - edge_weight_influence: Exponent of the edge weights in the attraction (0 ignores the weights).
+    - jitter_tolerance: How much swinging is tolerated, higher values are faster but less precise.
+    - barnes_hut: Approximate the repulsion with barnes_hut_repulsion() instead of computing all pairs.
+    - progress: Optional wrapper for the iteration range, e.g. tqdm.
+
+    Returns:
+    - positions: Array of shape (n, 2).
+    """
+    positions = np.array(positions, dtype=np.float64)
+    n = len(positions)
+    mass = np.bincount(np.concatenate([sources, targets]), minlength=n) + 1.0
+    edge_weights = weights ** edge_weight_influence if edge_weight_influence else np.ones_like(weights)
+    repulsion = barnes_hut_repulsion if barnes_hut else exact_repulsion
+
+    previous_forces = np.zeros((n, 2))
+    speed, speed_efficiency = 1.0, 1.0
+    steps = range(iterations) if progress is None else progress(range(iterations))
+    for _ in steps:
+        forces = repulsion(positions, mass, scaling_ratio)
+
+        # Gravity towards the origin
+        distance = np.sqrt((positions ** 2).sum(axis=1))
+        if strong_gravity:
+            forces -= (gravity * scaling_ratio * mass)[:, None] * positions
+        else:
+            pull = np.divide(gravity * mass, distance, out=np.zeros(n), where=distance > 0)
+            forces -= pull[:, None] * positions
+
+        # Linear attraction along the edges
+        delta = (positions[sources] - positions[targets]) * edge_weights[:, None]
+        for axis in range(2):
+            forces[:, axis] -= np.bincount(sources, weights=delta[:, axis], minlength=n)
+            forces[:, axis] += np.bincount(targets, weights=delta[:, axis], minlength=n)
+
+        # Adaptive speed, as in Gephi's ForceAtlas2
+        swinging = mass * np.sqrt(((previous_forces - forces) ** 2).sum(axis=1))
+        traction = mass * np.sqrt(((previous_forces + forces) ** 2).sum(axis=1)) / 2
+        total_swinging, total_traction = swinging.sum(), traction.sum()
+
+        estimated_jitter = 0.05 * np.sqrt(n)
+        jitter = jitter_tolerance * max(np.sqrt(estimated_jitter), min(10.0, estimated_jitter * total_traction / n ** 2))
+        if total_traction > 0 and total_swinging / total_traction > 2.0:
+            if speed_efficiency > 0.05:
+                speed_efficiency *= 0.5
+            jitter = max(jitter, jitter_tolerance)
+        target_speed = jitter * speed_efficiency * total_traction / total_swinging if total_swinging > 0 else np.inf
+        if total_swinging > jitter * total_traction:
+            if speed_efficiency > 0.05:
+                speed_efficiency *= 0.7
+        elif speed < 1000:
+            speed_efficiency *= 1.3
+        speed += min(target_speed - speed, 0.5 * speed)
+
+        factor = speed / (1.0 + np.sqrt(speed * swinging))
+        positions += forces * factor[:, None]
+        previous_forces = forces
+
+    return positions
+
+
+def node_sizes(graphology_data, min_size=1.0, max_size=10.0):
+    """
+    Scale node sizes linearly by degree between min_size and max_size, like Gephi's ranking by degree.
+    """
+    keys, sources, targets, _ = graph_arrays(graphology_data)
+    degree = np.bincount(np.concatenate([sources, targets]), minlength=len(keys)).astype(np.float64)
+    spread = degree.max() - degree.min() if len(degree) else 0.0
+    if not spread:
+        return np.full(len(keys), min_size)
+    return min_size + (degree - degree.min()) / spread * (max_size - min_size)
+
+
+def forceatlas2_layout(graphology_data, previous_data=None, iterations=500, seed=42, min_size=1.0, max_size=10.0, **kwargs):
+    """
+    Lay out a Graphology document with ForceAtlas2 and return the result in the format of a Gephi JSON export,
+    so that it can replace the Gephi file in update_graphology_with_gephi_layout().
+
+    Parameters:
+    - graphology_data: The Graphology format JSON object.
+    - previous_data: A Graphology document with x/y coordinates (e.g. the previous release) to warm-start from (optional).
+      Nodes are matched by node_identity(), as integer keys change between releases.
+    - iterations: Number of ForceAtlas2 iterations.
+    - seed: Seed for the positions of new nodes.
+    - min_size, max_size: Range of the node sizes, see node_sizes().
+    - kwargs: Further settings of forceatlas2().
+
+    Returns:
+    - gephi_data: A dictionary with 'nodes', each with 'key' and 'attributes' x, y, size and color.
+    """
+    keys, sources, targets, weights = graph_arrays(graphology_data)
+    previous = None
+    if previous_data is not None:
+        previous = {node_identity(node): (node["attributes"]["x"], node["attributes"]["y"]) for node in previous_data["nodes"]}
+
+    identities = [node_identity(node) for node in graphology_data["nodes"]]
+    positions = initial_positions(identities, sources, targets, previous, seed)
+    positions = forceatlas2(positions, sources, targets, weights, iterations=iterations, **kwargs)
+    sizes = node_sizes(graphology_data, min_size, max_size)
+
+    nodes = [
+        {"key": key, "attributes": {"x": float(x), "y": float(y), "size": float(size), "color": "#000000"}}
+        for key, (x, y), size in zip(keys, positions, sizes)
+    ]
+    return {"nodes": nodes}
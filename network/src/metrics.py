@@ -0,0 +1,221 @@
+import hashlib
+import math
+import os
+import pickle
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+
+import stage_cache
+from compact_graph import as_networkx
+
+# Directory of the cached metric results, relative to network/src and network/notebooks
+CACHE_DIR = "../data/metrics"
+
+
+def graph_fingerprint(G):
+    """
+    Hash the structure of a graph: its nodes with their main role, and its edges with their weight.
+    Graphs with the same fingerprint have the same metrics.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(G.is_directed()).encode("utf8"))
+    for node, role in G.nodes(data="main_role"):
+        digest.update(repr((node, role)).encode("utf8"))
+    for u, v, weight in G.edges(data="weight"):
+        digest.update(repr((u, v, weight)).encode("utf8"))
+    return digest.hexdigest()
+
+
+def sample_size(n, epsilon=0.05, delta=0.1):
+    """
+    Number of sampled source nodes so that, by Hoeffding's inequality and a union bound over the nodes,
+    every normalized betweenness estimate is within epsilon of the exact value with probability 1 - delta.
+    The same budget is used for closeness, where epsilon bounds the error relative to the diameter.
+    """
+    if n < 2:
+        return n
+    return min(n, math.ceil(math.log(2 * n / delta) / (2 * epsilon ** 2)))
+
+
+def graph_stats(G):
+    """
+    Compute the summary statistics of a graph used in the diachronic plots.
+
+    Parameters:
+    - G: NetworkX DiGraph from create_graph().
+
+    Returns:
+    - stats: A dict with node and edge counts, density, average degrees (overall, translators, authors),
+      average clustering, connected components, size and share of the largest component and degree assortativity.
+      Values that are undefined for the graph (e.g. averages over no nodes) are None.
+    """
+    stats = {}
+    n = len(G)
+    degrees = dict(G.degree())
+    translators = [node for node, role in G.nodes(data="main_role") if role == "tõlkija"]
+    authors = [node for node, role in G.nodes(data="main_role") if role != "tõlkija"]
+
+    stats["nodes"] = n
+    stats["edges"] = G.number_of_edges()
+    stats["density"] = nx.density(G)
+    stats["average_degree"] = sum(degrees.values()) / n if n else None
+    stats["average_translator_degree"] = sum(degrees[node] for node in translators) / len(translators) if translators else None
+    stats["average_author_degree"] = sum(degrees[node] for node in authors) / len(authors) if authors else None
+
+    undirected = G.to_undirected()
+    components = list(nx.connected_components(undirected)) if n else []
+    largest_cc_size = max((len(component) for component in components), default=0)
+    stats["average_clustering"] = nx.average_clustering(undirected) if n else None
+    stats["connected_components"] = len(components)
+    stats["largest_cc_size"] = largest_cc_size
+    stats["largest_cc_proportion"] = largest_cc_size / n if n else 0
+    stats["degree_assortativity"] = nx.degree_assortativity_coefficient(undirected) if n > 1 else None
+    return stats
+
+
+def approximate_betweenness(G, samples=None, epsilon=0.05, delta=0.1, seed=42, weight=None):
+    """
+    Estimate the normalized betweenness centrality from shortest paths of a random sample of source nodes
+    (Brandes & Pich 2007). Exact if the sample covers all nodes.
+
+    Parameters:
+    - G: NetworkX graph.
+    - samples: Number of source nodes. Derived from epsilon and delta with sample_size() if None.
+    - epsilon, delta: Error budget, see sample_size().
+    - seed: Seed of the sample.
+    - weight: Edge attribute used as distance, None for unweighted paths.
+
+    Returns:
+    - centrality: A dict mapping nodes to their estimated betweenness.
+    """
+    samples = sample_size(len(G), epsilon, delta) if samples is None else min(samples, len(G))
+    if samples >= len(G):
+        return nx.betweenness_centrality(G, weight=weight)
+    return nx.betweenness_centrality(G, k=samples, weight=weight, seed=seed)
+
+
+def approximate_closeness(G, samples=None, epsilon=0.05, delta=0.1, seed=42, distance=None):
+    """
+    Estimate the closeness centrality of nx.closeness_centrality() (distances towards each node,
+    Wasserman–Faust scaling for unreachable nodes) from the shortest paths of a random sample of
+    source nodes (Eppstein & Wang 2004). Exact if the sample covers all nodes.
+
+    Parameters:
+    - G: NetworkX graph.
+    - samples: Number of source nodes. Derived from epsilon and delta with sample_size() if None.
+    - epsilon, delta: Error budget, see sample_size().
+    - seed: Seed of the sample.
+    - distance: Edge attribute used as distance, None for unweighted paths.
+
+    Returns:
+    - centrality: A dict mapping nodes to their estimated closeness.
+    """
+    n = len(G)
+    samples = sample_size(n, epsilon, delta) if samples is None else min(samples, n)
+    if samples >= n:
+        return nx.closeness_centrality(G, distance=distance)
+
+    reached = dict.fromkeys(G, 0)
+    total_distance = dict.fromkeys(G, 0.0)
+    for source in random.Random(seed).sample(list(G), samples):
+        if distance is None:
+            lengths = nx.single_source_shortest_path_length(G, source)
+        else:
+            lengths = nx.single_source_dijkstra_path_length(G, source, weight=distance)
+        for node, length in lengths.items():
+            reached[node] += 1
+            total_distance[node] += length
+
+    # Scale the sampled counts and distance sums up to all n sources
+    scale = n / samples
+    centrality = {}
+    for node in G:
+        reachable = reached[node] * scale
+        distance_sum = total_distance[node] * scale
+        if distance_sum > 0 and n > 1:
+            centrality[node] = (reachable - 1) / distance_sum * (reachable - 1) / (n - 1)
+        else:
+            centrality[node] = 0.0
+    return centrality
+
+
+METRICS = {
+    "stats": graph_stats,
+    "degree": nx.degree_centrality,
+    "betweenness": approximate_betweenness,
+    "closeness": approximate_closeness,
+}
+
+
+def cache_path(G, metric, options, cache_dir=CACHE_DIR):
+    """
+    Path of the cached result of a metric, keyed by the graph fingerprint, the metric, its options and the
+    code of this module, so that a change to an estimator invalidates its results.
+    """
+    code = stage_cache.code_version(sys.modules[__name__])
+    key = hashlib.sha256(repr((graph_fingerprint(G), metric, sorted(options.items()), code)).encode("utf8")).hexdigest()
+    return os.path.join(cache_dir, f"{metric}_{key[:24]}.pickle")
+
+
+def run_metric(G, metric, path=None, **options):
+    """
+    Compute one metric of a graph and write it to the cache path, if given.
+    Runs in the worker processes of compute_metrics(), so it has to stay a module-level function.
+    A compact_graph.CompactGraph is converted to NetworkX first.
+    """
+    result = METRICS[metric](as_networkx(G), **options)
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return result
+
+
+def compute_metrics(graphs, metric, workers=1, cache_dir=CACHE_DIR, **options):
+    """
+    Compute one metric for many graphs, e.g. the year windows of create_graphs().
+    Cached results are loaded, the others are computed in a pool of worker processes if workers > 1.
+
+    Parameters:
+    - graphs: A list of NetworkX graphs or compact_graph.CompactGraphs.
+    - metric: A name in METRICS ("stats", "degree", "betweenness" or "closeness").
+    - workers: Number of worker processes.
+    - cache_dir: Directory of the cached results, None to disable caching.
+    - options: Keyword arguments of the metric function, e.g. samples or weight.
+
+    Returns:
+    - results: A list of results in the order of graphs.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', use one of {', '.join(METRICS)}")
+
+    results, missing = [], []
+    for i, G in enumerate(graphs):
+        path = cache_path(G, metric, options, cache_dir) if cache_dir is not None else None
+        if path is not None and os.path.isfile(path):
+            with open(path, "rb") as f:
+                results.append(pickle.load(f))
+        else:
+            results.append(None)
+            missing.append((i, path))
+
+    if workers <= 1 or len(missing) <= 1:
+        for i, path in missing:
+            results[i] = run_metric(graphs[i], metric, path, **options)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(i, executor.submit(run_metric, graphs[i], metric, path, **options)) for i, path in missing]
+        for i, future in futures:
+            results[i] = future.result()
+    return results
+
+
+def compute_metric(G, metric, cache_dir=CACHE_DIR, **options):
+    """
+    Compute one metric of a graph, or load it from the cache, see compute_metrics().
+    """
+    return compute_metrics([G], metric, cache_dir=cache_dir, **options)[0]
@@ -0,0 +1,189 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Number of parsed person strings kept in the LRU cache, see set_cache_size()
+DEFAULT_CACHE_SIZE = 2 ** 17
+
+# Titles enclosed in quotes, e.g. 'Name (1850-1910): "Title"'
+TITLE_PATTERN = re.compile(r': ".*?"')
+# 'u. ' prefix indicating an uncertain date
+UNCERTAIN_PATTERN = re.compile(r'^u\. ?')
+# 'e. Kr' (BC dates) and 'p. Kr' (AD dates)
+BC_PATTERN = re.compile(r'e\. ?Kr\.?', re.IGNORECASE)
+AD_PATTERN = re.compile(r'p\. ?Kr\.?', re.IGNORECASE)
+ERA_PATTERN = re.compile(r'(e\. ?Kr\.?|p\. ?Kr\.?)', re.IGNORECASE)
+# Name (birth_date - death_date) [role]
+PERSON_PATTERN = re.compile(r'^(.+?)\s*\((.*?)\)\s*(?:\[(.+?)\])?$')
+# Name [role] or Name
+NAME_ROLE_PATTERN = re.compile(r'^(.+?)\s*(?:\[(.+?)\])?$')
+
+
+def process_date(date_str):
+    """
+    Convert a birth or death date string into an integer.
+
+    Parameters:
+    - date_str: The date string, e.g. '1850', 'u. 1850' or '43 e. Kr.'.
+
+    Returns:
+    - A tuple (date, is_bc). The date is None if it is not a valid integer.
+    """
+    if not date_str:
+        return None, False  # Return None and BC indicator as False
+    date_str = date_str.strip()
+    is_bc = False
+
+    # Remove 'u. ' prefix indicating uncertainty
+    date_str = UNCERTAIN_PATTERN.sub('', date_str)
+
+    # Check for 'e. Kr' (BC dates) and 'p. Kr' (AD dates)
+    if BC_PATTERN.search(date_str):
+        is_bc = True
+    elif AD_PATTERN.search(date_str):
+        is_bc = False  # Explicitly marked as AD
+
+    # Remove 'e. Kr' or 'p. Kr' suffixes
+    date_str = ERA_PATTERN.sub('', date_str).strip()
+
+    # Convert date string to integer
+    try:
+        date_int = int(date_str)
+        return date_int, is_bc
+    except ValueError:
+        return None, False  # Return None if the date is not a valid integer
+
+
+def parse_person(person_str, role=True):
+    """
+    Parse a person string of the form 'Name (birth_date-death_date) [role]'.
+    This is the uncached parser behind extract_person_info().
+
+    Parameters:
+    - person_str: The person string.
+    - role: Include the role in the result.
+
+    Returns:
+    - A tuple (name, birth_date, death_date, role), or (name, birth_date, death_date) if role=False.
+      BC dates are negative. Values that can't be parsed are None.
+    """
+    # Remove any titles enclosed in quotes
+    person_str = TITLE_PATTERN.sub('', person_str)
+
+    match = PERSON_PATTERN.match(person_str)
+    if match:
+        name, date_range, role_str = match.groups()
+        name = name.strip()
+        role_str = role_str.strip().lower() if role_str and role else None
+
+        # Split the date range into birth and death dates
+        birth_date_str, _, death_date_str = date_range.partition('-')
+
+        # Process birth and death dates
+        birth_date, birth_is_bc = process_date(birth_date_str)
+        death_date, death_is_bc = process_date(death_date_str)
+
+        # If the death date is BC and the birth date is not explicitly AD, assume birth date is BC
+        if death_is_bc and not birth_is_bc and birth_date is not None:
+            birth_is_bc = True
+            birth_date = -birth_date
+        elif birth_is_bc and birth_date is not None:
+            birth_date = -birth_date
+
+        # If the death date is BC, make it negative
+        if death_is_bc and death_date is not None:
+            death_date = -death_date
+
+        if role:
+            return (name, birth_date, death_date, role_str)
+        else:
+            return (name, birth_date, death_date)
+
+    # Handle cases with only the name and optional role
+    match = NAME_ROLE_PATTERN.match(person_str)
+    if match:
+        name, role_str = match.groups()
+        name = name.strip()
+        role_str = role_str.strip().lower() if role_str and role else None
+
+        if role:
+            return (name, None, None, role_str)
+        else:
+            return (name, None, None)
+
+    # Return None values if no pattern matched
+    if role:
+        return (None, None, None, None)
+    else:
+        return (None, None, None)
+
+
+cached_parse_person = lru_cache(maxsize=DEFAULT_CACHE_SIZE)(parse_person)
+
+
+def extract_person_info(person_str, role=True):
+    """
+    Parse a person string of the form 'Name (birth_date-death_date) [role]', see parse_person().
+    Results are memoized in a bounded LRU cache keyed by the raw string.
+    """
+    return cached_parse_person(person_str, role)
+
+
+def set_cache_size(maxsize):
+    """
+    Replace the parser cache with an empty LRU cache of the given size (None for an unbounded cache).
+    """
+    global cached_parse_person
+    cached_parse_person = lru_cache(maxsize=maxsize)(parse_person)
+
+
+def cache_stats():
+    """
+    Return the hit-rate statistics of the parser cache, e.g. for tuning its size.
+
+    Returns:
+    - stats: A dict with 'hits', 'misses', 'hit_rate', 'maxsize' and 'currsize'.
+    """
+    info = cached_parse_person.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+        "maxsize": info.maxsize,
+        "currsize": info.currsize,
+    }
+
+
+def parse_person_series(series, role=True):
+    """
+    Parse a Series of "; "-joined person strings (e.g. the 'creator' column) into a long table.
+    Every distinct person string is parsed once, through the cache of extract_person_info().
+
+    Parameters:
+    - series: pd.Series of person strings. Missing values are skipped.
+    - role: Include the role in the result.
+
+    Returns:
+    - persons: pd.DataFrame with one row per person and the columns 'record' (index label in series),
+      'position' (order within the string), 'raw', 'name', 'date_of_birth', 'date_of_death' and 'role'
+      (if role=True). Empty person strings are dropped, positions are counted before dropping.
+    """
+    series = series.dropna()
+    split = [person_str.split("; ") for person_str in series.tolist()]
+    lengths = np.array([len(people) for people in split], dtype=np.int64)
+    raw = [person_str for people in split for person_str in people]
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    persons = pd.DataFrame({
+        "record": np.repeat(series.index.to_numpy(), lengths),
+        "position": np.arange(len(raw)) - starts,
+        "raw": pd.Series(raw, dtype=object),
+    })
+    persons = persons[np.array([bool(person_str.strip()) for person_str in raw], dtype=bool)].reset_index(drop=True)
+
+    columns = ["name", "date_of_birth", "date_of_death", "role"] if role else ["name", "date_of_birth", "date_of_death"]
+    codes, uniques = pd.factorize(persons["raw"])
+    parsed = pd.DataFrame([cached_parse_person(person_str, role) for person_str in uniques], columns=columns, dtype=object)
+    return pd.concat([persons, parsed.iloc[codes].reset_index(drop=True)], axis=1)
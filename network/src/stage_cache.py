@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+# Directory of the cached stage artifacts, relative to network/src
+CACHE_DIR = "../data/cache"
+
+# Default limits of evict()
+MAX_CACHE_MB = 4096
+MAX_AGE_DAYS = 30
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Hash the content of a file (SHA-256), so that a renamed or touched but unchanged input hits the cache.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(*modules):
+    """
+    Hash the source files of the given modules. Any change in the code of a stage invalidates its artifacts.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def stage_key(**parts):
+    """
+    Combine the inputs of a stage (file digests, parameters, code versions) into one cache key.
+    The parts must be JSON-serializable.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf8")).hexdigest()
+
+
+def entry_path(stage, key, cache_dir=CACHE_DIR):
+    """
+    Directory of the cache entry of a stage.
+    """
+    return os.path.join(cache_dir, stage, key)
+
+
+def touch(path):
+    """
+    Mark a cache entry as used, for the age and size eviction of evict().
+    """
+    now = time.time()
+    os.utime(path, (now, now))
+
+
+def load_artifact(stage, key, cache_dir=CACHE_DIR):
+    """
+    Load the pickled artifact of a stage.
+
+    Returns:
+    - The artifact, or None on a cache miss.
+    """
+    path = os.path.join(entry_path(stage, key, cache_dir), "artifact.pickle")
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        artifact = pickle.load(f)
+    touch(os.path.dirname(path))
+    return artifact
+
+
+def save_artifact(stage, key, artifact, cache_dir=CACHE_DIR):
+    """
+    Pickle the artifact of a stage into the cache. The file is written under a temporary name
+    and renamed, so an interrupted run doesn't leave a broken entry.
+    """
+    entry = entry_path(stage, key, cache_dir)
+    os.makedirs(entry, exist_ok=True)
+    path = os.path.join(entry, "artifact.pickle")
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+    touch(entry)
+
+
+def restore_files(stage, key, targets, cache_dir=CACHE_DIR):
+    """
+    Copy the cached output files of a stage to their target paths.
+
+    Parameters:
+    - stage, key: The cache entry.
+    - targets: A dict mapping the names of the cached files to the paths they are copied to.
+
+    Returns:
+    - True if all files were cached and copied, False on a cache miss (nothing is copied).
+    """
+    entry = entry_path(stage, key, cache_dir)
+    if not all(os.path.isfile(os.path.join(entry, name)) for name in targets):
+        return False
+    for name, path in targets.items():
+        shutil.copyfile(os.path.join(entry, name), path)
+    touch(entry)
+    return True
+
+
+def save_files(stage, key, sources, cache_dir=CACHE_DIR):
+    """
+    Copy the output files of a stage into the cache.
+
+    Parameters:
+    - stage, key: The cache entry.
+    - sources: A dict mapping the names of the cached files to the paths they are copied from.
+    """
+    entry = entry_path(stage, key, cache_dir)
+    os.makedirs(entry, exist_ok=True)
+    for name, path in sources.items():
+        shutil.copyfile(path, os.path.join(entry, name) + ".tmp")
+        os.replace(os.path.join(entry, name) + ".tmp", os.path.join(entry, name))
+    touch(entry)
+
+
+def entry_size(entry):
+    return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+
+def evict(cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB, max_age_days=MAX_AGE_DAYS):
+    """
+    Remove cache entries that were not used for max_age_days, then the least recently used
+    entries until the cache is smaller than max_mb. None disables a limit.
+
+    Returns:
+    - removed: The number of removed entries.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = [
+        os.path.join(cache_dir, stage, key)
+        for stage in os.listdir(cache_dir) if os.path.isdir(os.path.join(cache_dir, stage))
+        for key in os.listdir(os.path.join(cache_dir, stage))
+    ]
+    entries = sorted((os.path.getmtime(entry), entry_size(entry), entry) for entry in entries)
+
+    removed = 0
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    for used_at, size, entry in entries:
+        too_old = max_age_days is not None and now - used_at > max_age_days * 86400
+        too_large = max_mb is not None and total > max_mb * 2 ** 20
+        if not (too_old or too_large):
+            continue
+        shutil.rmtree(entry)
+        total -= size
+        removed += 1
+    return removed
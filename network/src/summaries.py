@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+import compact_graph
+
+# Number of partners kept in every ego summary
+TOP_K = 10
+
+
+def factorize(values):
+    """
+    Encode values as integer codes in order of first occurrence. Unlike pd.factorize(), missing values
+    (genres of records without a 'genre_keyword') are kept as None in the uniques.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    uniques = np.asarray(uniques, dtype=object)
+    uniques[pd.isna(uniques)] = None
+    return codes, uniques
+
+
+def edge_tables(G):
+    """
+    Flatten the edges of a graph into long tables.
+
+    Returns:
+    - incident: pd.DataFrame with the columns 'node', 'partner' (node keys), 'edge' and 'weight', one row per edge and endpoint.
+    - works: pd.DataFrame with the columns 'edge', 'year' and 'language', one row per work of an edge.
+    - genres: pd.DataFrame with the columns 'edge' and 'genre', one row per genre of an edge.
+    """
+    sources, targets, weights, works, languages, genres = [], [], [], [], [], []
+    for u, v, attrs in G.edges(data=True):
+        sources.append(u)
+        targets.append(v)
+        weights.append(attrs.get("weight", 1))
+        works.append(attrs.get("works", []))
+        languages.append(attrs.get("languages", []))
+        genres.append(attrs.get("genres", []))
+    n_edges = len(sources)
+    edges = np.arange(n_edges)
+
+    incident = pd.DataFrame({
+        "node": np.array(sources + targets, dtype=object),
+        "partner": np.array(targets + sources, dtype=object),
+        "edge": np.concatenate([edges, edges]),
+        "weight": np.array(weights + weights, dtype=np.int64),
+    })
+
+    work_counts = np.array([len(edge_works) for edge_works in works], dtype=np.int64)
+    work_table = pd.DataFrame({
+        "edge": np.repeat(edges, work_counts),
+        "year": np.array([year for edge_works in works for _, year in edge_works], dtype=np.int64),
+        "language": np.array([language for edge_languages in languages for language in edge_languages], dtype=object),
+    })
+
+    genre_counts = np.array([len(edge_genres) for edge_genres in genres], dtype=np.int64)
+    genre_table = pd.DataFrame({
+        "edge": np.repeat(edges, genre_counts),
+        "genre": np.array([genre for edge_genres in genres for genre in edge_genres], dtype=object),
+    })
+    return incident, work_table, genre_table
+
+
+def value_ranks(uniques):
+    """
+    Rank unique values in sorted order, None last, to break ties between equal counts independently of the
+    order of the values (genre sets iterate in hash order).
+    """
+    order = sorted(range(len(uniques)), key=lambda i: (uniques[i] is None, uniques[i] if uniques[i] is not None else 0))
+    ranks = np.empty(len(uniques), dtype=np.int64)
+    ranks[order] = np.arange(len(uniques))
+    return ranks
+
+
+def histogram(values):
+    """
+    Count values and return [value, count] pairs, most frequent first and ties by value (None last).
+    """
+    codes, uniques = factorize(values)
+    counts = np.bincount(codes, minlength=len(uniques))
+    order = np.lexsort([value_ranks(uniques), -counts])
+    return [[value, count] for value, count in zip(uniques[order].tolist(), counts[order].tolist())]
+
+
+def grouped_histograms(groups, values, sort_by_value=False):
+    """
+    Count values per group, see histogram().
+
+    Parameters:
+    - groups: Array of group keys.
+    - values: Array of values, aligned with groups.
+    - sort_by_value: Order the pairs by value (e.g. decades) instead of by count.
+
+    Returns:
+    - A dict mapping every group to its list of [value, count] pairs.
+    """
+    if not len(groups):
+        return {}
+    group_codes, group_keys = factorize(groups)
+    value_codes, value_keys = factorize(values)
+    counts = pd.DataFrame({"group": group_codes, "value": value_codes}).groupby(["group", "value"]).size().reset_index(name="count")
+    if sort_by_value:
+        order = np.lexsort([value_keys[counts["value"].to_numpy()].astype(np.int64), counts["group"].to_numpy()])
+    else:
+        order = np.lexsort([value_ranks(value_keys)[counts["value"].to_numpy()], -counts["count"].to_numpy(), counts["group"].to_numpy()])
+    counts = counts.iloc[order]
+    return split_pairs(group_keys, counts["group"].to_numpy(), value_keys[counts["value"].to_numpy()], counts["count"].to_numpy())
+
+
+def split_pairs(group_keys, groups, values, counts):
+    """
+    Split [value, count] pairs sorted by group code into one list per group.
+    """
+    pairs = [[value, count] for value, count in zip(values.tolist(), counts.tolist())]
+    bounds = np.flatnonzero(np.diff(groups)) + 1
+    starts = np.concatenate([[0], bounds]).tolist()
+    ends = np.concatenate([bounds, [len(groups)]]).tolist()
+    return {group_keys[groups[start]]: pairs[start:end] for start, end in zip(starts, ends)}
+
+
+def top_partners(incident, top_k=TOP_K):
+    """
+    Return the top_k partners of every node by the total weight of the edges between them (in either direction).
+
+    Returns:
+    - A dict mapping node keys to [partner, weight] pairs, heaviest first and ties by partner key. Ties are broken
+      on the original keys, so that integer keys sort numerically; the partners are returned as strings, like the
+      node keys of the Graphology export.
+    """
+    if incident.empty:
+        return {}
+    totals = incident.groupby(["node", "partner"], sort=False)["weight"].sum().reset_index()
+    totals = totals.sort_values(["node", "weight", "partner"], ascending=[True, False, True], kind="stable")
+    totals = totals.groupby("node", sort=False).head(top_k)
+    node_codes, node_keys = factorize(totals["node"].to_numpy())
+    partners = np.array([str(partner) for partner in totals["partner"].tolist()], dtype=object)
+    return split_pairs(node_keys, node_codes, partners, totals["weight"].to_numpy())
+
+
+def add_summaries(G, top_k=TOP_K):
+    """
+    Precompute the ego summaries of all nodes and the facet tables of the graph, so that a viewer
+    doesn't have to aggregate the edges of a node on click or all edges on load.
+
+    Every node gets the attribute 'ego', a dict with:
+    - 'languages': [language, count] pairs of the original languages of the works on its edges.
+    - 'genres': [genre, count] pairs of the genres of its edges (None for unknown genres).
+    - 'decades': [decade, count] pairs of the publication decades of the works on its edges, by decade.
+    - 'partners': The top_k [partner key, weight] pairs by the weight of the edges between them.
+    Counts are per edge, as in the viewer: a work on two edges of a node is counted twice.
+
+    The graph gets the attributes (written to the export as the Graphology graph attributes):
+    - 'facets': A dict with the graph-wide 'languages', 'genres' and 'decades' pairs.
+    - 'year_index': [year, edges, works] triples: the number of edges with a work of that year and the number of works.
+
+    Parameters:
+    - G: A NetworkX graph or a compact_graph.CompactGraph from create_graph().
+    - top_k: Number of partners per node.
+
+    Returns:
+    - G: The graph, updated in place.
+    """
+    incident, works, genres = edge_tables(G)
+
+    # Join the works and genres of every edge to both of its endpoints
+    edge_nodes = incident[["edge", "node"]]
+    node_works = works.merge(edge_nodes, on="edge")
+    node_genres = genres.merge(edge_nodes, on="edge")
+    decades = works["year"].to_numpy() // 10 * 10
+    node_decades = node_works["year"].to_numpy() // 10 * 10
+
+    languages = grouped_histograms(node_works["node"].to_numpy(), node_works["language"].to_numpy())
+    genre_counts = grouped_histograms(node_genres["node"].to_numpy(), node_genres["genre"].to_numpy())
+    decade_counts = grouped_histograms(node_works["node"].to_numpy(), node_decades, sort_by_value=True)
+    partners = top_partners(incident, top_k)
+
+    ego = {}
+    for node in G.nodes():
+        ego[node] = {
+            "languages": languages.get(node, []),
+            "genres": genre_counts.get(node, []),
+            "decades": decade_counts.get(node, []),
+            "partners": partners.get(node, []),
+        }
+    compact_graph.set_node_attributes(G, ego, "ego")
+
+    year_counts = works.groupby("year").agg(edges=("edge", "nunique"), works=("edge", "size")).reset_index()
+    G.graph["facets"] = {
+        "languages": histogram(works["language"].to_numpy()),
+        "genres": histogram(genres["genre"].to_numpy()),
+        "decades": sorted(histogram(decades)),
+    }
+    G.graph["year_index"] = year_counts[["year", "edges", "works"]].to_numpy().tolist()
+    return G
@@ -0,0 +1,148 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# Building blocks of the synthetic names, titles and genres
+SURNAMES = [
+    "Tamm", "Saar", "Sepp", "Mägi", "Kask", "Kukk", "Rebane", "Ilves", "Pärn", "Koppel", "Lepp", "Kuusk",
+    "Puškin", "Tolstoi", "Tšehhov", "Goethe", "Schiller", "Dickens", "Twain", "Hugo", "Verne", "Lindgren",
+    "Andersen", "Kivi", "Waltari", "Smith", "Brown", "Müller", "Dumas", "Cervantes",
+]
+FIRST_NAMES = [
+    "Jaan", "Mari", "Anna", "Peeter", "Aleksandr", "John", "Lev", "Kai", "Tiit", "Ene", "Johann",
+    "Charles", "Astrid", "Victor", "Jules", "Aino", "Mika", "Hans", "Friedrich", "Maria",
+]
+TITLE_WORDS = [
+    "meri", "mets", "öö", "tuul", "armastus", "sõda", "kodu", "tee", "saladus", "kuningas", "linn",
+    "aeg", "unenägu", "vari", "täht", "jõgi", "talv", "naine", "poeg", "vabadus",
+]
+GENRES = [
+    "romaanid", "jutustused", "ilukirjandus", "luuletused", "e-raamatud", "näidendid [žanr]",
+    "novellid (kogumik)", "muinasjutud", "ulmekirjandus", "krimiromaanid", "lastekirjandus", "ajalooromaanid",
+]
+LANGUAGES = ["eng", "rus", "ger", "fin", "fre", "swe", "nor", "pol", "ita", "spa", "lav", "hun", "jpn", "lat"]
+CREATOR_ROLES = ["autor"] * 8 + ["koostaja", None]
+CONTRIBUTOR_ROLES = ["tõlkija"] * 7 + ["toimetaja", "illustreerija", None]
+
+
+def person_strings(n_people, rng):
+    """
+    Create a pool of person strings in the formats of the ENB person columns, e.g. 'Tamm, Jaan (1850-1910)',
+    'Saar, Mari (1950-)', 'Kivi, Aino (u. 1700-1750)', 'Hugo, Lev (43-17 e. Kr.)' or just 'Tamm, Jaan'.
+    """
+    surnames = rng.choice(SURNAMES, n_people)
+    first_names = rng.choice(FIRST_NAMES, n_people)
+    births = rng.integers(1700, 2000, n_people)
+    lifespans = rng.integers(25, 95, n_people)
+    formats = rng.choice(5, n_people, p=[0.55, 0.15, 0.04, 0.02, 0.24])
+
+    people = []
+    for i, (surname, first_name, birth, lifespan, fmt) in enumerate(zip(surnames, first_names, births, lifespans, formats)):
+        # A number keeps the names of the large pools distinct
+        name = f"{surname}, {first_name}" if i < len(SURNAMES) * len(FIRST_NAMES) else f"{surname}{i}, {first_name}"
+        if fmt == 0:
+            people.append(f"{name} ({birth}-{birth + lifespan})")
+        elif fmt == 1:
+            people.append(f"{name} ({birth}-)")
+        elif fmt == 2:
+            people.append(f"{name} (u. {birth}-{birth + lifespan})")
+        elif fmt == 3:
+            people.append(f"{name} ({birth - 1600}-{max(birth - 1600 - lifespan, 1)} e. Kr.)")
+        else:
+            people.append(name)
+    return np.array(people, dtype=object)
+
+
+def person_column(people, popularity, roles, max_count, rng, n_rows, missing=0.05, title_share=0.02):
+    """
+    Draw a "; "-joined person column: 1 to max_count people per record (weighted by popularity),
+    each with an optional role and, rarely, a quoted title.
+    """
+    counts = rng.integers(1, max_count + 1, n_rows)
+    counts[rng.random(n_rows) < 0.7] = 1
+    slots = []
+    for slot in range(max_count):
+        present = counts > slot
+        chosen = people[rng.choice(len(people), n_rows, p=popularity)]
+        role_values = rng.choice(len(roles), n_rows)
+        suffixes = np.array([f" [{role}]" if role else "" for role in roles], dtype=object)[role_values]
+        titled = rng.random(n_rows) < title_share
+        slots.append([
+            (person + suffix + (': "Valitud teosed"' if is_titled else "")) if is_present else None
+            for person, suffix, is_titled, is_present in zip(chosen, suffixes, titled, present)
+        ])
+
+    column = ["; ".join(filter(None, values)) for values in zip(*slots)]
+    column = pd.Series(column, dtype=object)
+    column[rng.random(n_rows) < missing] = None
+    return column
+
+
+def generate_erb(n_rows, n_people=None, seed=42, fiction_share=0.8, est_share=0.9):
+    """
+    Generate a synthetic bibliography with the record identifiers (erb_loader.RECORD_ID_COLUMN) and the columns of erb_loader.GRAPH_COLUMNS, for benchmarks and tests
+    without the ENB data. Popular people appear in many records, so the graph has hubs like the real one.
+
+    Parameters:
+    - n_rows: Number of records.
+    - n_people: Size of the person pool. Defaults to n_rows // 4 (at least 1000).
+    - seed: Seed of the random number generator.
+    - fiction_share: Share of records with is_fiction == True.
+    - est_share: Share of records in Estonian.
+
+    Returns:
+    - erb: pd.DataFrame with one row per record.
+    """
+    rng = np.random.default_rng(seed)
+    n_people = n_people or max(n_rows // 4, 1000)
+    people = person_strings(n_people, rng)
+    popularity = 1.0 / np.arange(1, n_people + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    words = np.array(TITLE_WORDS, dtype=object)
+    title_ids = rng.integers(0, max(n_rows // 2, 1), n_rows)
+    titles = [f"{words[i % len(words)].capitalize()} {words[(i // len(words)) % len(words)]} {i}" for i in title_ids.tolist()]
+
+    genre_values = np.array(GENRES, dtype=object)
+    genre_counts = rng.integers(1, 4, n_rows)
+    # Three distinct genres per record (distinct offsets from a random first genre), of which the first genre_counts are used
+    first_offsets = rng.integers(1, len(GENRES) - 1, n_rows)
+    second_offsets = first_offsets + 1 + np.floor(rng.random(n_rows) * (len(GENRES) - 1 - first_offsets)).astype(np.int64)
+    offsets = np.column_stack([np.zeros(n_rows, dtype=np.int64), first_offsets, second_offsets])
+    genre_picks = (rng.integers(0, len(GENRES), n_rows)[:, None] + offsets) % len(GENRES)
+    genres = ["; ".join(genre_values[picks[:count]]) for picks, count in zip(genre_picks, genre_counts)]
+    genres = pd.Series(genres, dtype=object)
+    genres[rng.random(n_rows) < 0.1] = None
+
+    language_original = pd.Series(rng.choice(np.array(LANGUAGES, dtype=object), n_rows), dtype=object)
+    language_original[rng.random(n_rows) < 0.05] = None
+
+    # More books in recent decades
+    years = 1800 + np.floor(rng.beta(2.5, 1.2, n_rows) * 226).astype(np.int64)
+
+    return pd.DataFrame({
+        "id": pd.Series([f"b{i:08d}" for i in range(n_rows)], dtype=object),
+        "creator": person_column(people, popularity, CREATOR_ROLES, 3, rng, n_rows),
+        "contributor": person_column(people, popularity, CONTRIBUTOR_ROLES, 3, rng, n_rows, missing=0.1),
+        "title": pd.Series(titles, dtype=object),
+        "publication_date_cleaned": years,
+        "language_original": language_original,
+        "genre_keyword": genres,
+        "is_fiction": rng.random(n_rows) < fiction_share,
+        "language": np.where(rng.random(n_rows) < est_share, "est", "rus").astype(object),
+    })
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic ERB Parquet file.")
+    parser.add_argument("rows", type=int, help="number of records")
+    parser.add_argument("--output", help="output path (default: ../data/raw/synthetic_erb_<rows>.parquet)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default: 42)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = args.output or f"../data/raw/synthetic_erb_{args.rows}.parquet"
+    generate_erb(args.rows, seed=args.seed).to_parquet(output, index=False)
+    print(f"Saved {args.rows} synthetic records to {output}")
@@ -0,0 +1,293 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from graphology_io import iter_graphology
+
+# A level is fine enough when no tile holds more nodes than this (counting every node individually)
+MAX_TILE_NODES = 2000
+
+# Deepest zoom level of the quadtree
+MAX_LEVEL = 10
+
+# Coarse levels aggregate small nodes into a grid of 2**CLUSTER_DEPTH × 2**CLUSTER_DEPTH clusters per tile
+CLUSTER_DEPTH = 3
+
+# Attributes copied into the tiles, the rest stays in the full data file
+TILE_NODE_ATTRIBUTES = ("label", "x", "y", "size", "color", "author_lang", "main_role", "total_count")
+TILE_EDGE_ATTRIBUTES = ("weight", "size", "color", "language", "activity_start", "activity_end")
+
+# Path of a tile relative to the tile directory
+TILE_PATH = "z{level}/{x}_{y}.json"
+
+
+def read_tile_graph(path):
+    """
+    Read the laid-out graph of an updated Graphology file (see update_data.py) with only the tile attributes.
+
+    Returns:
+    - nodes: pd.DataFrame with the columns 'key', 'x', 'y', 'size', 'color' and 'attributes' (dicts of TILE_NODE_ATTRIBUTES).
+    - edges: pd.DataFrame with the columns 'key', 'source' and 'target' (row positions in nodes), 'size',
+      'weight', 'color' and 'attributes' (dicts of TILE_EDGE_ATTRIBUTES).
+    """
+    nodes, edges = [], []
+    for key, items in iter_graphology(path):
+        if key == "nodes":
+            nodes = [
+                (node["key"], {k: node["attributes"][k] for k in TILE_NODE_ATTRIBUTES if k in node["attributes"]})
+                for node in items
+            ]
+        elif key == "edges":
+            edges = [
+                (edge["key"], edge["source"], edge["target"], {k: edge["attributes"][k] for k in TILE_EDGE_ATTRIBUTES if k in edge["attributes"]})
+                for edge in items
+            ]
+
+    node_frame = pd.DataFrame({
+        "key": [key for key, _ in nodes],
+        "x": np.array([attrs.get("x", 0.0) for _, attrs in nodes], dtype=np.float64),
+        "y": np.array([attrs.get("y", 0.0) for _, attrs in nodes], dtype=np.float64),
+        "size": np.array([attrs.get("size", 1.0) for _, attrs in nodes], dtype=np.float64),
+        "color": [attrs.get("color", "#000000") for _, attrs in nodes],
+        "attributes": [attrs for _, attrs in nodes],
+    })
+    index = pd.Index(node_frame["key"])
+    edges = [edge for edge in edges if edge[1] in index and edge[2] in index]
+    edge_frame = pd.DataFrame({
+        "key": [key for key, _, _, _ in edges],
+        "source": index.get_indexer([source for _, source, _, _ in edges]),
+        "target": index.get_indexer([target for _, _, target, _ in edges]),
+        "size": np.array([attrs.get("size", 1.0) for *_, attrs in edges], dtype=np.float64),
+        "weight": np.array([attrs.get("weight", 1) for *_, attrs in edges], dtype=np.int64),
+        "color": [attrs.get("color", "#000000") for *_, attrs in edges],
+        "attributes": [attrs for *_, attrs in edges],
+    })
+    return node_frame, edge_frame
+
+
+def grid_cells(x, y, bounds, resolution):
+    """
+    Return the column and row of the points in a resolution × resolution grid over bounds (x0, y0, side).
+    """
+    x0, y0, side = bounds
+    cx = np.clip(((x - x0) / side * resolution).astype(np.int64), 0, resolution - 1)
+    cy = np.clip(((y - y0) / side * resolution).astype(np.int64), 0, resolution - 1)
+    return cx, cy
+
+
+def square_bounds(x, y):
+    """
+    Return the smallest square (x0, y0, side) around the points, the root cell of the quadtree.
+    """
+    if not len(x):
+        return 0.0, 0.0, 1.0
+    side = max(x.max() - x.min(), y.max() - y.min()) or 1.0
+    # Widen the square slightly so the points on the upper edges fall inside
+    return float(x.min()), float(y.min()), float(side * (1 + 1e-9))
+
+
+def tree_depth(x, y, bounds, max_tile_nodes=MAX_TILE_NODES, max_level=MAX_LEVEL):
+    """
+    Return the first level at which no tile holds more than max_tile_nodes nodes, at most max_level.
+    """
+    for level in range(max_level + 1):
+        cx, cy = grid_cells(x, y, bounds, 2 ** level)
+        if not len(x) or np.bincount(cy * 2 ** level + cx).max() <= max_tile_nodes:
+            return level
+    return max_level
+
+
+def level_budgets(n_nodes, depth, max_tile_nodes=MAX_TILE_NODES):
+    """
+    Return the number of nodes shown individually at each level: level z shows the max_tile_nodes * 4**z
+    largest nodes, so the average tile stays within budget. The last level shows all nodes.
+    """
+    return [min(max_tile_nodes * 4 ** level, n_nodes) if level < depth else n_nodes for level in range(depth + 1)]
+
+
+def dominant(groups, values, n_groups):
+    """
+    Return the most frequent value of every group (ties by first occurrence).
+    """
+    counts = pd.DataFrame({"group": groups, "value": values}).groupby(["group", "value"], sort=False).size()
+    counts = counts.reset_index(name="count").sort_values(["group", "count"], ascending=[True, False], kind="stable")
+    result = np.empty(n_groups, dtype=object)
+    first = counts.drop_duplicates("group")
+    result[first["group"].to_numpy()] = first["value"].to_numpy()
+    return result
+
+
+def build_level(nodes, edges, bounds, level, kept, cluster_depth=CLUSTER_DEPTH):
+    """
+    Build the nodes and edges of one zoom level. The nodes selected by the boolean mask kept are shown, the others are
+    merged into cluster nodes per cell of a (2**(level + cluster_depth))² grid. Edges between two kept nodes are
+    kept, the others are merged per pair of endpoints; edges within a cluster are dropped.
+
+    Returns:
+    - level_nodes: pd.DataFrame with the columns 'key', 'tile', 'record' (the node as written to the tiles).
+    - level_edges: pd.DataFrame with the columns 'source_tile', 'target_tile' and 'record'.
+    """
+    x, y, sizes = nodes["x"].to_numpy(), nodes["y"].to_numpy(), nodes["size"].to_numpy()
+    resolution = 2 ** (level + cluster_depth)
+    cx, cy = grid_cells(x, y, bounds, resolution)
+
+    # Representative of every node: itself if kept, else the cluster of its cell
+    cells = np.where(kept, -1, cy * resolution + cx)
+    cluster_cells, cluster_codes = np.unique(cells[~kept], return_inverse=True)
+    n_kept, n_clusters = int(kept.sum()), len(cluster_cells)
+    representative = np.empty(len(nodes), dtype=np.int64)
+    representative[kept] = np.arange(n_kept)
+    representative[~kept] = n_kept + cluster_codes
+
+    # Clusters sit at the size-weighted centroid of their members, with the area of all members
+    members = np.flatnonzero(~kept)
+    mass = np.bincount(cluster_codes, weights=sizes[members], minlength=n_clusters)
+    cluster_x = np.bincount(cluster_codes, weights=x[members] * sizes[members], minlength=n_clusters) / mass
+    cluster_y = np.bincount(cluster_codes, weights=y[members] * sizes[members], minlength=n_clusters) / mass
+    cluster_size = np.sqrt(np.bincount(cluster_codes, weights=sizes[members] ** 2, minlength=n_clusters))
+    cluster_count = np.bincount(cluster_codes, minlength=n_clusters)
+    cluster_color = dominant(cluster_codes, nodes["color"].to_numpy()[members], n_clusters)
+    cluster_keys = [f"c{level}-{cell}" for cell in cluster_cells.tolist()]
+
+    tiles_per_side = 2 ** level
+    kept_tx, kept_ty = grid_cells(x[kept], y[kept], bounds, tiles_per_side)
+    cluster_tx = (cluster_cells % resolution) >> cluster_depth
+    cluster_ty = (cluster_cells // resolution) >> cluster_depth
+    node_tiles = np.concatenate([kept_ty * tiles_per_side + kept_tx, cluster_ty * tiles_per_side + cluster_tx])
+
+    records = [{"key": key, "attributes": attrs} for key, attrs in zip(nodes["key"][kept].tolist(), nodes["attributes"][kept].tolist())]
+    records += [
+        {"key": key, "attributes": {
+            "label": str(count), "x": float(cx_), "y": float(cy_), "size": float(size), "color": color,
+            "cluster": True, "count": count,
+        }}
+        for key, cx_, cy_, size, color, count in zip(
+            cluster_keys, cluster_x.tolist(), cluster_y.tolist(), cluster_size.tolist(), cluster_color.tolist(), cluster_count.tolist()
+        )
+    ]
+    level_nodes = pd.DataFrame({"key": [record["key"] for record in records], "tile": node_tiles, "record": records})
+
+    # Edges between kept nodes stay, the others are merged per pair of representatives
+    source, target = edges["source"].to_numpy(), edges["target"].to_numpy()
+    rep_source, rep_target = representative[source], representative[target]
+    both_kept = kept[source] & kept[target]
+    merged = ~both_kept & (rep_source != rep_target)
+
+    node_keys = nodes["key"].tolist()
+    edge_records = [
+        {"key": key, "source": node_keys[u], "target": node_keys[v], "attributes": attrs}
+        for key, u, v, attrs in zip(
+            edges["key"][both_kept].tolist(), source[both_kept].tolist(), target[both_kept].tolist(), edges["attributes"][both_kept].tolist()
+        )
+    ]
+    edge_sources, edge_targets = rep_source[both_kept].tolist(), rep_target[both_kept].tolist()
+
+    if merged.any():
+        pairs = pd.DataFrame({
+            "source": rep_source[merged], "target": rep_target[merged],
+            "weight": edges["weight"].to_numpy()[merged], "size": edges["size"].to_numpy()[merged],
+        })
+        pair_codes, pair_keys = pd.factorize(pairs["source"] * (n_kept + n_clusters) + pairs["target"])
+        totals = pairs.groupby(pair_codes, sort=True).agg(
+            source=("source", "first"), target=("target", "first"), weight=("weight", "sum"), size=("size", "max"), count=("weight", "size"),
+        )
+        colors = dominant(pair_codes, edges["color"].to_numpy()[merged], len(pair_keys))
+        rep_keys = level_nodes["key"].tolist()
+        for i, (u, v, weight, size, count, color) in enumerate(zip(
+            totals["source"].tolist(), totals["target"].tolist(), totals["weight"].tolist(),
+            totals["size"].tolist(), totals["count"].tolist(), colors.tolist(),
+        )):
+            edge_records.append({"key": f"e{level}-{i}", "source": rep_keys[u], "target": rep_keys[v], "attributes": {
+                "weight": weight, "size": size, "color": color, "count": count,
+            }})
+            edge_sources.append(u)
+            edge_targets.append(v)
+
+    level_edges = pd.DataFrame({
+        "source_tile": node_tiles[np.array(edge_sources, dtype=np.int64)],
+        "target_tile": node_tiles[np.array(edge_targets, dtype=np.int64)],
+        "record": edge_records,
+    })
+    return level_nodes, level_edges
+
+
+def write_tiles(path, output_dir, max_tile_nodes=MAX_TILE_NODES, max_level=MAX_LEVEL, cluster_depth=CLUSTER_DEPTH):
+    """
+    Cut a laid-out graph into level-of-detail tiles, so that a viewer can load only the visible part
+    of the map at a detail that fits the zoom.
+
+    The tiles form a quadtree over the node positions: level z splits the bounding square into
+    2**z × 2**z tiles, and only non-empty tiles are written. Levels are added until no tile holds more
+    than max_tile_nodes nodes. Coarse level z shows only the max_tile_nodes * 4**z largest nodes (their
+    smallest size is the 'size_threshold' of the level). It merges the others into cluster nodes
+    (attribute 'cluster': true, 'count': number of members) and their edges into aggregated edges
+    ('count': number of merged edges, 'weight': their total weight). The last level shows every node and edge.
+
+    Every tile is a Graphology document with the nodes in the tile and the edges with an endpoint in it, so an
+    edge between two tiles is in both (with the same key). output_dir gets an 'index.json' with the bounds, the
+    tile path pattern and per level its 'size_threshold' and 'tiles' ([x, y, nodes, edges] entries).
+
+    Parameters:
+    - path: An updated Graphology file from update_data.py (with x, y, size and color).
+    - output_dir: Directory of the tiles. It is replaced if it exists.
+    - max_tile_nodes: Node budget of a tile.
+    - max_level: Deepest level.
+    - cluster_depth: Clusters per tile side of the coarse levels, as a power of two.
+
+    Returns:
+    - index: The tile index.
+    """
+    nodes, edges = read_tile_graph(path)
+    x, y = nodes["x"].to_numpy(), nodes["y"].to_numpy()
+    bounds = square_bounds(x, y)
+    depth = tree_depth(x, y, bounds, max_tile_nodes, max_level)
+    sizes = nodes["size"].to_numpy()
+    # Rank of every node by size, largest first; ties keep the node order
+    rank = np.empty(len(nodes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(nodes))
+
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    levels = []
+    for level, budget in enumerate(level_budgets(len(nodes), depth, max_tile_nodes)):
+        kept = rank < budget
+        level_nodes, level_edges = build_level(nodes, edges, bounds, level, kept, cluster_depth)
+        tiles_per_side = 2 ** level
+
+        # Every edge goes to the tile of its source and, if different, to the tile of its target
+        edge_tiles = pd.concat([
+            level_edges[["source_tile", "record"]].rename(columns={"source_tile": "tile"}),
+            level_edges.loc[level_edges["target_tile"] != level_edges["source_tile"], ["target_tile", "record"]].rename(columns={"target_tile": "tile"}),
+        ])
+        node_groups = dict(tuple(level_nodes.groupby("tile")["record"]))
+        edge_groups = dict(tuple(edge_tiles.groupby("tile")["record"]))
+
+        tile_entries = []
+        for tile in sorted(set(node_groups) | set(edge_groups)):
+            tx, ty = tile % tiles_per_side, tile // tiles_per_side
+            tile_nodes = node_groups[tile].tolist() if tile in node_groups else []
+            tile_edges = edge_groups[tile].tolist() if tile in edge_groups else []
+            tile_path = os.path.join(output_dir, TILE_PATH.format(level=level, x=tx, y=ty))
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+            with open(tile_path, "w", encoding="utf8") as f:
+                f.write(json.dumps({"nodes": tile_nodes, "edges": tile_edges}, ensure_ascii=False))
+            tile_entries.append([tx, ty, len(tile_nodes), len(tile_edges)])
+
+        levels.append({
+            "level": level,
+            "size_threshold": float(sizes[kept].min()) if kept.any() else None,
+            "nodes": len(level_nodes),
+            "clusters": int(sum(record["attributes"].get("cluster", False) for record in level_nodes["record"])),
+            "edges": len(level_edges),
+            "tiles": tile_entries,
+        })
+
+    x0, y0, side = bounds
+    os.makedirs(output_dir, exist_ok=True)
+    index = {"bounds": {"x": x0, "y": y0, "side": side}, "tile_path": TILE_PATH, "levels": levels}
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    return index
@@ -1,6 +1,13 @@
 import json
-import sys
+import argparse
 import os
+from contextlib import ExitStack
+from tqdm import tqdm
+import instrumentation
+import layout
+import stage_cache
+import tiles
+from graphology_io import GraphologyWriter, compress_file, iter_graphology, read_graphology, split_edge
 
 # Constants for size coefficients and alpha transparency
 node_size_coefficient = 1.0
@@ -8,13 +15,24 @@ edge_size_coefficient = 0.2
 node_alpha = 0.8
 edge_alpha = 0.9  # Corrected from 'edge_alpa'
 
-# Load color scheme from 'languages.json'
-with open("../data/languages.json", "r", encoding="utf8") as f:
-    language_data = json.load(f)
+# Color scheme and language names of the language codes, see load_languages()
+LANGUAGES_PATH = "../data/languages.json"
+
+def load_languages(path=LANGUAGES_PATH):
+    """
+    Load the language codes and colors from 'languages.json'.
+
+    Returns:
+    - language_codes: A dictionary mapping language codes to language names.
+    - language_colors: A dictionary mapping language codes to colors, with a color for 'tlk' (translator) added.
+    """
+    with open(path, "r", encoding="utf8") as f:
+        language_data = json.load(f)
     language_codes = language_data["codes"]
     language_colors = language_data["colors"]
     # Add a specific color for 'tlk' (translator)
     language_colors["tlk"] = "rgb(129, 129, 236)"
+    return language_codes, language_colors
 
 def add_alpha_to_color(rgb_code: str, alpha: float) -> str:
     """
@@ -29,138 +47,246 @@ def add_alpha_to_color(rgb_code: str, alpha: float) -> str:
     """
     return rgb_code[:-1] + f", {alpha})"
 
-def update_graphology_with_gephi_layout(graphology_data, gephi_data):
+def color_tables(language_codes, language_colors):
     """
-    Updates the nodes in the Graphology JSON format with the x, y, size, and color attributes from the Gephi JSON format.
+    Precompute the RGBA color strings of nodes and edges once per language.
 
     Parameters:
-    - graphology_data: The Graphology format JSON object.
-    - gephi_data: The Gephi-generated JSON object.
+    - language_codes: A dictionary mapping language codes to language names.
+    - language_colors: A dictionary mapping language codes to colors.
 
     Returns:
-    - Updated graphology_data with new x, y, size, and color values.
+    - node_colors: A dictionary mapping the node languages (the language codes, 'tlk' and 'other') to colors.
+    - edge_colors: A dictionary mapping the languages of language_colors to edge colors.
     """
-    # Create a lookup dictionary for Gephi nodes
-    gephi_node_lookup = {node["key"]: node["attributes"] for node in gephi_data["nodes"]}
-
-    # Update Graphology nodes with Gephi layout information
-    for node in graphology_data["nodes"]:
-        node_key = node["key"]
+    other = language_colors["other"]
+    node_colors = {
+        language: add_alpha_to_color(language_colors.get(language, other), node_alpha)
+        for language in [*language_codes, "tlk", "other"]
+    }
+    edge_colors = {language: add_alpha_to_color(color, edge_alpha) for language, color in language_colors.items()}
+    return node_colors, edge_colors
+
+def layout_lookup(gephi_nodes):
+    """
+    Index the node positions and sizes of a Gephi JSON export (or of layout.forceatlas2_layout()) by node key.
 
-        if node_key in gephi_node_lookup:
-            gephi_attrs = gephi_node_lookup[node_key]
+    Parameters:
+    - gephi_nodes: An iterable of Gephi nodes with 'key' and 'attributes'.
 
-            # Update attributes
-            node["attributes"]["x"] = gephi_attrs.get("x", 0.0)
-            node["attributes"]["y"] = gephi_attrs.get("y", 0.0)
-            node["attributes"]["size"] = gephi_attrs.get("size", 1.0)
-            node["attributes"]["color"] = gephi_attrs.get("color", "#000000")
+    Returns:
+    - A dictionary mapping node keys to (x, y, size) tuples.
+    """
+    lookup = {}
+    for node in gephi_nodes:
+        attrs = node["attributes"]
+        lookup[node["key"]] = (attrs.get("x", 0.0), attrs.get("y", 0.0), attrs.get("size", 1.0))
+    return lookup
 
-    return graphology_data
+def read_layout(path):
+    """
+    Read the node positions and sizes of a Gephi JSON export node by node, see layout_lookup().
+    """
+    for key, value in iter_graphology(path, stream_keys=("nodes",)):
+        if key == "nodes":
+            return layout_lookup(value)
+    return {}
 
-def update_nodes(graphology_data, size_coefficient):
+def read_layout_graph(path):
+    """
+    Read the parts of a Graphology JSON file that layout.forceatlas2_layout() uses: the node keys
+    and labels, and the edge endpoints and weights.
+    """
+    graph_data = {"nodes": [], "edges": []}
+    for key, items in iter_graphology(path):
+        if key == "nodes":
+            graph_data["nodes"] = [
+                {"key": node["key"], "attributes": {k: v for k, v in node["attributes"].items() if k == "label"}}
+                for node in items
+            ]
+        elif key == "edges":
+            graph_data["edges"] = [
+                {"source": edge["source"], "target": edge["target"], "attributes": {"weight": edge["attributes"].get("weight", 1.0)}}
+                for edge in items
+            ]
+    return graph_data
+
+def update_node(node, layout_positions, language_codes, node_colors):
     """
-    Adjusts node sizes based on the provided coefficient.
+    Apply the layout, size and color updates to one Graphology node in place: the position and size
+    from the layout (scaled by node_size_coefficient), and the color of the author language.
+    Translators get the language 'tlk' and unknown languages 'other'.
 
     Parameters:
-    - graphology_data: The Graphology format JSON object.
-    - size_coefficient: The coefficient to adjust node sizes.
+    - node: A Graphology node with 'key' and 'attributes'.
+    - layout_positions: A dictionary mapping node keys to (x, y, size), see layout_lookup().
+    - language_codes: A dictionary mapping language codes to language names.
+    - node_colors: The node colors from color_tables().
 
     Returns:
-    - Updated graphology_data with adjusted node sizes.
+    - The updated node.
     """
-    for node in graphology_data["nodes"]:
-        node["attributes"]["size"] *= size_coefficient
+    attrs = node["attributes"]
+    node_lang = attrs.get("author_lang", "other")
+    rename = True
+    if node_lang == "tõlkija":
+        node_lang = "tlk"
+    elif node_lang not in language_codes:
+        node_lang = "other"
+    else:
+        rename = False
+
+    position = layout_positions.get(node["key"])
+    if position is not None:
+        attrs["x"], attrs["y"], size = position
+        attrs["size"] = size * node_size_coefficient
+    else:
+        instrumentation.count("nodes_without_layout")
+        attrs["size"] *= node_size_coefficient
 
-    return graphology_data
+    if rename:
+        attrs["author_lang"] = node_lang
+    attrs["color"] = node_colors[node_lang]
+    return node
 
-def update_edges(graphology_data, size_coefficient):
+def update_edge(edge, edge_colors):
     """
-    Adjusts edge sizes based on the provided coefficient.
+    Apply the size and color updates to one Graphology edge in place: the size is scaled by
+    edge_size_coefficient and the color is that of the edge language ('other' if it has no color).
 
     Parameters:
-    - graphology_data: The Graphology format JSON object.
-    - size_coefficient: The coefficient to adjust edge sizes.
+    - edge: A Graphology edge with 'attributes'.
+    - edge_colors: The edge colors from color_tables().
 
     Returns:
-    - Updated graphology_data with adjusted edge sizes.
+    - The updated edge.
     """
-    for edge in graphology_data["edges"]:
-        edge_size = edge["attributes"].get("size", 1.0)
-        edge["attributes"]["size"] = edge_size * size_coefficient
+    attrs = edge["attributes"]
+    attrs["size"] = attrs.get("size", 1.0) * edge_size_coefficient
+    attrs["color"] = edge_colors.get(attrs.get("language", "other"), edge_colors["other"])
+    return edge
 
-    return graphology_data
-
-def update_languages_and_colors(graphology_data, language_codes, language_colors):
+def update_graphology_file(input_path, output_path, layout_positions, language_codes, language_colors, meta_path=None, backend="json"):
     """
-    Updates node and edge colors based on language data.
+    Stream a Graphology JSON file through update_node() and update_edge() in a single pass.
+    Nodes and edges are read, updated and written one at a time, so memory use doesn't grow with the graph.
 
     Parameters:
-    - graphology_data: The Graphology format JSON object.
+    - input_path: The Graphology JSON file from create_graph.py.
+    - output_path: Path of the updated file.
+    - layout_positions: A dictionary mapping node keys to (x, y, size), see layout_lookup().
     - language_codes: A dictionary mapping language codes to language names.
     - language_colors: A dictionary mapping language codes to colors.
+    - meta_path: If given, the edge works, languages and genres are written to this file instead,
+      see graphology_io.split_graphology().
+    - backend: JSON backend of the output, see graphology_io.get_encoder(). "json" writes the same
+      text as json.dump(..., ensure_ascii=False).
 
     Returns:
-    - Updated graphology_data.
+    - paths: The paths of the written JSON files.
     """
-    # Update node colors
-    for node in graphology_data["nodes"]:
-        node_lang = node["attributes"].get("author_lang", "other")
-        if node_lang == "tõlkija":
-            node_lang = "tlk"
-            node["attributes"]["author_lang"] = "tlk"
-        elif node_lang not in language_codes:
-            node_lang = "other"
-            node["attributes"]["author_lang"] = "other"
-
-        # Update node color
-        color = language_colors.get(node_lang, language_colors["other"])
-        node["attributes"]["color"] = add_alpha_to_color(color, node_alpha)
-
-    # Update edge colors
-    for edge in graphology_data["edges"]:
-        edge_lang = edge["attributes"].get("language", "other")
-        if edge_lang not in language_colors:
-            edge_lang = "other"
-
-        color = language_colors.get(edge_lang, language_colors["other"])
-        edge["attributes"]["color"] = add_alpha_to_color(color, edge_alpha)
+    node_colors, edge_colors = color_tables(language_codes, language_colors)
+    with ExitStack() as stack:
+        writer = stack.enter_context(GraphologyWriter(output_path, backend, ensure_ascii=False))
+        meta_writer = stack.enter_context(GraphologyWriter(meta_path, backend, ensure_ascii=False)) if meta_path else None
+        for key, value in iter_graphology(input_path):
+            if key == "nodes":
+                writer.begin(key)
+                for node in value:
+                    writer.item(update_node(node, layout_positions, language_codes, node_colors))
+                    instrumentation.count("nodes")
+                writer.end()
+            elif key == "edges":
+                writer.begin(key)
+                if meta_writer:
+                    meta_writer.begin(key)
+                for edge in value:
+                    edge = update_edge(edge, edge_colors)
+                    if meta_writer:
+                        edge, metadata = split_edge(edge)
+                        meta_writer.item(metadata)
+                    writer.item(edge)
+                    instrumentation.count("edges")
+                writer.end()
+                if meta_writer:
+                    meta_writer.end()
+            else:
+                writer.value(key, value)
+    return [output_path, meta_path] if meta_path else [output_path]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Combine the graph data with the layout from Gephi or ForceAtlas2.")
+    parser.add_argument("key", nargs="?", default="data", help="name of the data files (default: data)")
+    parser.add_argument("--chunked", action="store_true", help="write the edge works, languages and genres to a separate <key>_updated_meta.json")
+    parser.add_argument("--compress", nargs="+", choices=["gz", "br"], default=[], help="also write precompressed copies of the output files")
+    parser.add_argument("--layout", choices=["gephi", "fa2"], default="gephi", help="take the layout from the Gephi JSON export (default) or compute it with ForceAtlas2")
+    parser.add_argument("--previous", help="with --layout fa2, start from the node positions of this file, e.g. the previous release's data.json")
+    parser.add_argument("--iterations", type=int, default=500, help="number of ForceAtlas2 iterations (default: 500)")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the ForceAtlas2 start positions (default: 42)")
+    parser.add_argument("--backend", choices=["json", "orjson", "auto"], default="json", help="JSON encoder of the output; orjson is faster and writes compact JSON (default: json)")
+    parser.add_argument("--tiles", action="store_true", help="also write level-of-detail tiles with an index.json to ../data/tiles/<key>/")
+    parser.add_argument("--tile-nodes", type=int, default=tiles.MAX_TILE_NODES, help=f"node budget of a tile (default: {tiles.MAX_TILE_NODES})")
+    parser.add_argument("--report", help="write a JSON report with the stage timings and counters to this path")
+    parser.add_argument("--no-cache", action="store_true", help=f"don't read or write the cached ForceAtlas2 layout in {stage_cache.CACHE_DIR}")
+    return parser.parse_args()
 
-    return graphology_data
 
 if __name__ == "__main__":
-
-    if len(sys.argv) == 2:
-        key = sys.argv[1]
-    else:
-        key = "data"
+    args = parse_args()
+    key = args.key
+    if key == "data":
         print("Using default key 'data'. Use 'python update_data.py <key>' to change the default value")
 
-    # Load the Graphology JSON file
-    with open(f"../data/{key}.json", "r", encoding="utf8") as f:
-        graphology_data = json.load(f)
-
-    # Load the Gephi JSON file
-    gephi_file = f"../data/gephi/{key}.json"
-    if not os.path.isfile(gephi_file):
-        raise FileNotFoundError(f"The file {gephi_file} does not exist. Use the export to JSON command in Gephi to create it.")
-    with open(gephi_file, "r", encoding="utf8") as f:
-        gephi_data = json.load(f)
-
-    # Update the Graphology JSON with the Gephi layout
-    graphology_data = update_graphology_with_gephi_layout(graphology_data, gephi_data)
-
-    # Adjust node and edge sizes
-    graphology_data = update_nodes(graphology_data, node_size_coefficient)
-    graphology_data = update_edges(graphology_data, edge_size_coefficient)
-
-    # Update languages and colors
-    graphology_data = update_languages_and_colors(
-        graphology_data, language_codes, language_colors
-    )
-
-    # Save the updated Graphology JSON file
-    with open(f"../data/{key}_updated.json", "w", encoding="utf8") as f:
-        json.dump(graphology_data, f, ensure_ascii=False, indent=4)
-
-    print(f"Graph file with updated data saved to {key}_updated.json.\nRename this file 'data.json' and copy it to the app/public folder.")
\ No newline at end of file
+    with instrumentation.run("update_data", args.report, **vars(args)):
+        graph_path = f"../data/{key}.json"
+        with instrumentation.stage("layout"):
+            if args.layout == "fa2":
+                # Compute the layout instead of loading it from Gephi
+                layout_key = stage_cache.stage_key(
+                    stage="layout",
+                    graph=stage_cache.file_digest(graph_path),
+                    previous=stage_cache.file_digest(args.previous) if args.previous else None,
+                    iterations=args.iterations,
+                    seed=args.seed,
+                    code=stage_cache.code_version(layout),
+                )
+                gephi_data = None if args.no_cache else stage_cache.load_artifact("layout", layout_key)
+                if gephi_data is None:
+                    previous_data = read_graphology(args.previous) if args.previous else None
+                    print(f"Computing the ForceAtlas2 layout ({args.iterations} iterations)")
+                    gephi_data = layout.forceatlas2_layout(
+                        read_layout_graph(graph_path), previous_data, iterations=args.iterations, seed=args.seed, progress=tqdm
+                    )
+                    if not args.no_cache:
+                        stage_cache.save_artifact("layout", layout_key, gephi_data)
+                        stage_cache.evict()
+                else:
+                    print("Loaded the ForceAtlas2 layout from the cache")
+                layout_positions = layout_lookup(gephi_data["nodes"])
+            else:
+                # Load the node positions from the Gephi JSON file
+                gephi_file = f"../data/gephi/{key}.json"
+                if not os.path.isfile(gephi_file):
+                    raise FileNotFoundError(f"The file {gephi_file} does not exist. Use the export to JSON command in Gephi to create it, or use --layout fa2.")
+                layout_positions = read_layout(gephi_file)
+
+        # Update the layout, sizes and colors and save the updated Graphology JSON file in one pass
+        with instrumentation.stage("update"):
+            language_codes, language_colors = load_languages()
+            meta_path = f"../data/{key}_updated_meta.json" if args.chunked else None
+            paths = update_graphology_file(
+                graph_path, f"../data/{key}_updated.json", layout_positions, language_codes, language_colors, meta_path, args.backend
+            )
+            for path in paths:
+                compress_file(path, args.compress)
+
+        if args.tiles:
+            # Cut the updated graph into level-of-detail tiles for zoomed-out views
+            print(f"Writing tiles to ../data/tiles/{key}")
+            with instrumentation.stage("tiles"):
+                tiles.write_tiles(f"../data/{key}_updated.json", f"../data/tiles/{key}", max_tile_nodes=args.tile_nodes)
+
+    print(f"Graph file with updated data saved to {key}_updated.json.\nRename this file 'data.json' and copy it to the app/public folder.")
+    if args.chunked:
+        print(f"The edge metadata is saved to {key}_updated_meta.json, copy it next to 'data.json' as 'data_meta.json'.")